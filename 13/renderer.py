@@ -0,0 +1,153 @@
+"""
+Incremental renderer of the breakout display, redrawing only the tiles
+that changed since the last frame
+"""
+
+import sys
+import time
+
+TILE_BLACK = 0
+TILE_WALL = 1
+TILE_BLOCK = 2
+TILE_PADDLE = 3
+TILE_BALL = 4
+TILE_ASCII_MAP = {
+    TILE_BLACK: ord('.'),
+    TILE_WALL: ord('+'),
+    TILE_BLOCK: ord('#'),
+    TILE_PADDLE: ord('-'),
+    TILE_BALL: ord('O')
+}
+
+DEFAULT_FPS = 60
+CLEAR_SCREEN = b'\x1b[2J'
+CLEAR_LINE = b'\x1b[K'
+
+
+def cursor_to(row, column):
+    """ ANSI sequence moving the cursor, row and column count from 1 """
+    return b'\x1b[%d;%dH' % (row, column)
+
+
+class Renderer:
+    """
+    Keeps a framebuffer of the display, the score on the first line and
+    the tiles below. The first frame draws it all, later ones write ANSI
+    sequences to the stream redrawing the tiles changed since the last
+    frame, a run of changed tiles in a row at once. Frames are throttled
+    to fps a second, a frame that comes too soon is skipped and its
+    changes go out with the next one. Headless, the framebuffer is kept
+    but nothing is written.
+
+    >>> import io
+    >>> stream = io.BytesIO()
+    >>> now = [0.0]
+    >>> screen = Renderer(stream, fps=10, clock=lambda: now[0])
+    >>> screen.paint_all([0, 0, 1, 1, 0, 1, 2, 0, 1, 1, 1, 4, -1, 0, 7])
+    >>> screen.frame()
+    True
+    >>> stream.getvalue()
+    b'\\x1b[2J\\x1b[1;1Hscore: 7\\x1b[2;1H+++\\x1b[3;1H.O\\x1b[4;1H'
+    >>> screen.lines()
+    [b'+++', b'.O']
+    >>> _ = stream.seek(0), stream.truncate()
+    >>> screen.paint(1, 1, 0), screen.paint(2, 1, 4), screen.frame()
+    (None, None, False)
+    >>> now[0] = 0.1
+    >>> screen.paint(0, 1, 0), screen.frame(), stream.getvalue()
+    (None, True, b'\\x1b[3;2H.O\\x1b[4;1H')
+    >>> screen.frames, screen.skipped
+    (2, 1)
+    """
+    def __init__(self, stream=None, fps=DEFAULT_FPS, headless=False,
+                 clock=time.monotonic):
+        self.stream = sys.stdout.buffer if stream is None else stream
+        self.interval = 1 / fps if fps else 0
+        self.headless = headless
+        self.clock = clock
+        self.framebuffer = []
+        self.dirty = set()
+        self.score = 0
+        self.score_dirty = True
+        self.next_frame = None
+        self.frames = 0
+        self.skipped = 0
+
+    def __repr__(self):
+        return f'Renderer({self.frames} frames, {self.skipped} skipped)'
+
+    def paint(self, x, y, tile):
+        """ Apply one output triple, a tile or the score """
+        if x == -1 and y == 0:
+            if tile != self.score:
+                self.score = tile
+                self.score_dirty = True
+            return
+        while len(self.framebuffer) <= y:
+            self.framebuffer.append(bytearray())
+        row = self.framebuffer[y]
+        if len(row) <= x:
+            row.extend(TILE_ASCII_MAP[TILE_BLACK] for _ in
+                       range(x + 1 - len(row)))
+        pixel = TILE_ASCII_MAP[tile]
+        if row[x] != pixel:
+            row[x] = pixel
+            self.dirty.add((x, y))
+
+    def paint_all(self, outputs):
+        """ Apply a batch of outputs, the values of triples in order """
+        values = iter(outputs)
+        for x, y, tile in zip(values, values, values):
+            self.paint(x, y, tile)
+
+    def tiles(self):
+        """ Tiles of the framebuffer that are not black, by coordinate """
+        tiles = {pixel: tile for tile, pixel in TILE_ASCII_MAP.items()}
+        return {(x, y): tiles[pixel]
+                for y, row in enumerate(self.framebuffer)
+                for x, pixel in enumerate(row)
+                if pixel != TILE_ASCII_MAP[TILE_BLACK]}
+
+    def lines(self):
+        """ The framebuffer as lines of ASCII """
+        return [bytes(row) for row in self.framebuffer]
+
+    def frame(self, force=False):
+        """
+        End a frame, writing the changes unless it comes too soon after
+        the last one and is not forced. Returns whether it was drawn.
+        """
+        now = self.clock()
+        if not force and self.next_frame is not None and \
+                now < self.next_frame:
+            self.skipped += 1
+            return False
+        if not self.headless:
+            self.stream.write(self.diff())
+            self.stream.flush()
+        self.dirty.clear()
+        self.score_dirty = False
+        self.next_frame = now + self.interval
+        self.frames += 1
+        return True
+
+    def diff(self):
+        """ ANSI sequences redrawing what changed since the last frame """
+        if not self.frames:
+            return b''.join(
+                [CLEAR_SCREEN, cursor_to(1, 1), b'score: %d' % self.score] +
+                [cursor_to(y + 2, 1) + row
+                 for y, row in enumerate(self.framebuffer)] +
+                [cursor_to(len(self.framebuffer) + 2, 1)])
+        parts = []
+        if self.score_dirty:
+            parts.append(cursor_to(1, 1) + b'score: %d' % self.score +
+                         CLEAR_LINE)
+        run_x = run_y = None
+        for x, y in sorted(self.dirty, key=lambda xy: (xy[1], xy[0])):
+            if y != run_y or x != run_x:
+                parts.append(cursor_to(y + 2, x + 1))
+            parts.append(self.framebuffer[y][x:x + 1])
+            run_x, run_y = x + 1, y
+        parts.append(cursor_to(len(self.framebuffer) + 2, 1))
+        return b''.join(parts)
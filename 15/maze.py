@@ -0,0 +1,135 @@
+"""
+Map the maze of the repair droid by a breadth-first flood over forks of
+its program, then spread the oxygen over the map without the program
+"""
+
+import os
+import sys
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from intcode import (  # noqa: E402
+    STATE_WAIT_FOR_OUTPUT, BACKEND_INTERPRETER, run_until)
+
+MOVEMENT_STATUS_WALL = 0
+MOVEMENT_STATUS_MOVED = 1
+MOVEMENT_STATUS_FINISH = 2
+
+# Movement command and step of each direction, north is up
+MOVES = [(1, (0, 1)), (2, (0, -1)), (3, (-1, 0)), (4, (1, 0))]
+
+# A maze seven cells wide as a program, its cells follow the code, one
+# word each, 0 for a wall, 1 for open and 2 for the oxygen system. The
+# droid starts in the second column of the second row.
+MAZE_CODE = [
+    3, 95, 1001, 96, 0, 98, 1001, 97, 0, 99, 1008, 95, 1, 100, 1002, 100, -1,
+    100, 1, 99, 100, 99, 1008, 95, 2, 100, 1, 99, 100, 99, 1008, 95, 3, 100,
+    1002, 100, -1, 100, 1, 98, 100, 98, 1008, 95, 4, 100, 1, 98, 100, 98, 1002,
+    99, 7, 102, 1, 102, 98, 102, 1001, 102, 103, 102, 9, 102, 1201, 0, 0, 101,
+    1002, 102, -1, 102, 9, 102, 1005, 101, 82, 104, 0, 1105, 1, 0, 1001, 98, 0,
+    96, 1001, 99, 0, 97, 4, 101, 1105, 1, 0, 0, 1, 1, 0, 0, 0, 0, 0]
+
+
+def maze_program(rows):
+    """ Program of a maze drawn with '#', '.' and 'O', see MAZE_CODE """
+    return MAZE_CODE + ['#.O'.index(char) for char in ''.join(rows)]
+
+
+def explore(state, backend=BACKEND_INTERPRETER):
+    """
+    Map the maze from the droid's state waiting for its first movement
+    command. Every open cell keeps the state of the droid standing in
+    it, each neighbour not seen yet is tried by forking that state and
+    running it for one move, so the cells are reached in order of their
+    distance from the start. Returns the distance of every open cell
+    from the start (0, 0), the walls seen and the cell of the oxygen
+    system, None if there is none. A droid that stops without reporting
+    the status of its move raises an exception.
+
+    >>> from intcode import ExecutionState
+    >>> maze = ['#######',
+    ...         '#...#.#',
+    ...         '#.#...#',
+    ...         '#.#O#.#',
+    ...         '#######']
+    >>> distances, walls, oxygen = explore(
+    ...     ExecutionState(maze_program(maze)))
+    >>> oxygen, distances[oxygen], len(distances), len(walls)
+    ((2, -2), 4, 11, 17)
+    >>> fill_time(distances, oxygen)
+    6
+    >>> explore(ExecutionState([3, 0, 99]))
+    Traceback (most recent call last):
+        ...
+    Exception: Droid stopped with status 3 instead of reporting its move \
+to (0, 1)
+    """
+    distances = {(0, 0): 0}
+    walls = set()
+    oxygen = None
+    frontier = deque([((0, 0), state)])
+    while frontier:
+        (x, y), state = frontier.popleft()
+        distance = distances[x, y] + 1
+        for command, (dx, dy) in MOVES:
+            cell = (x + dx, y + dy)
+            if cell in distances or cell in walls:
+                continue
+            moved = state.fork([command])
+            status = run_until(moved, 1, backend)
+            if status != STATE_WAIT_FOR_OUTPUT:
+                raise Exception(f'Droid stopped with status {status} instead '
+                                f'of reporting its move to {cell}')
+            status = moved.outputs.popleft()
+            if status == MOVEMENT_STATUS_WALL:
+                walls.add(cell)
+                continue
+            if status == MOVEMENT_STATUS_FINISH:
+                oxygen = cell
+            distances[cell] = distance
+            frontier.append((cell, moved))
+    return distances, walls, oxygen
+
+
+def compact(cells):
+    """
+    Grid of the cells as a bytearray, 1 for the given cells and 0 for
+    the border of walls around them, with its width and a function from
+    cell to index
+    """
+    min_x = min(x for x, _ in cells) - 1
+    max_y = max(y for _, y in cells) + 1
+    width = max(x for x, _ in cells) - min_x + 2
+    height = max_y - min(y for _, y in cells) + 2
+
+    def index(cell):
+        return (max_y - cell[1]) * width + cell[0] - min_x
+
+    grid = bytearray(width * height)
+    for cell in cells:
+        grid[index(cell)] = 1
+    return grid, width, index
+
+
+def fill_time(cells, oxygen):
+    """
+    Minutes until the oxygen has spread from the oxygen system to every
+    open cell, by a breadth-first search over the compact grid of the
+    open cells
+    """
+    grid, width, index = compact(cells)
+    start = index(oxygen)
+    grid[start] = 0
+    frontier = [start]
+    minutes = -1
+    while frontier:
+        minutes += 1
+        spread = []
+        for i in frontier:
+            for j in (i - width, i - 1, i + 1, i + width):
+                if grid[j]:
+                    grid[j] = 0
+                    spread.append(j)
+        frontier = spread
+    return minutes
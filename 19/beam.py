@@ -0,0 +1,161 @@
+""" Geometry of the tractor beam, tracked by the edges of its rows """
+
+# Row the edges are first looked for in, the beam is patchy right next
+# to the emitter, and how far right of the emitter to look
+FIRST_ROW = 20
+FIRST_ROW_WIDTH = 10
+# Columns rounding the two edges of a square to whole points can gain
+ROUNDING = 4
+
+
+class Beam:
+    """
+    Left and right edges of the rows of a beam, given pulled(x, y) telling
+    whether a point is in the beam. A row of the beam is one contiguous
+    run of points. A row next to a known row is found by walking its
+    edges from the known ones, any other row by scaling a known row to an
+    estimate inside the beam and binary searching both edges from there.
+
+    >>> beam = Beam(lambda x, y: 3 * y <= 4 * x <= 5 * y)
+    >>> beam.edges(100), beam.edges(101), beam.edges(4000)
+    ((75, 125), (76, 126), (3000, 5000))
+    >>> len(beam.rows)
+    4
+    """
+    def __init__(self, pulled):
+        self.pulled = pulled
+        self.rows = {}
+
+    def __repr__(self):
+        return f'Beam({len(self.rows)} rows)'
+
+    def edges(self, y):
+        """ (left, right) x of row y, inclusive, or None if it is empty """
+        if y in self.rows:
+            return self.rows[y]
+        if not self.rows:
+            self.rows[FIRST_ROW] = self.scan(
+                FIRST_ROW, 0, FIRST_ROW * FIRST_ROW_WIDTH)
+        edges = None
+        if self.rows.get(y - 1) is not None:
+            edges = self.walk(y, *self.rows[y - 1])
+        if edges is None:
+            edges = self.search(y)
+        self.rows[y] = edges
+        return edges
+
+    def scan(self, y, start, end):
+        """ Edges of row y, looking for the beam between start and end """
+        for x in range(max(start, 0), end + 1):
+            if self.pulled(x, y):
+                return x, self.right_edge(x, y)
+        return None
+
+    def walk(self, y, left, right):
+        """
+        Edges of row y from those of the row above, which they are at
+        most one row width right of, None if the beam is not found there
+        """
+        limit = right + (right - left) + 2
+        while not self.pulled(left, y):
+            left += 1
+            if left > limit:
+                return None
+        x = max(left, right)
+        if not self.pulled(x, y):
+            return left, self.right_edge(left, y)
+        while self.pulled(x + 1, y):
+            x += 1
+        return left, x
+
+    def search(self, y):
+        """
+        Edges of row y scaled from the nearest known row that is not
+        empty, binary searched from a point inside the beam
+        """
+        known_y, (left, right) = min(
+            ((known_y, edges) for known_y, edges in self.rows.items()
+             if edges is not None), key=lambda row: abs(row[0] - y))
+        middle = (left + right) * y // (2 * known_y)
+        if not self.pulled(middle, y):
+            return self.scan(y, left * y // known_y - 2,
+                             right * y // known_y + 2)
+        low, high = 0, middle
+        while low < high:
+            x = (low + high) // 2
+            if self.pulled(x, y):
+                high = x
+            else:
+                low = x + 1
+        return low, self.right_edge(middle, y)
+
+    def right_edge(self, x, y):
+        """ Last x pulled in row y, galloping right from a pulled x """
+        step = 1
+        while self.pulled(x + step, y):
+            x += step
+            step *= 2
+        low, high = x, x + step - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.pulled(middle, y):
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def slack(self, bottom, size):
+        """
+        Columns to spare when fitting a square of size with its bottom in
+        row bottom, negative if it does not fit, None if a row is empty
+        """
+        if bottom - size + 1 < FIRST_ROW:
+            return None
+        lower = self.edges(bottom)
+        upper = self.edges(bottom - size + 1)
+        if lower is None or upper is None:
+            return None
+        return upper[1] - lower[0] - size + 1
+
+    def square_fits(self, bottom, size):
+        """ Check if a square of size fits with its bottom in row bottom """
+        slack = self.slack(bottom, size)
+        return slack is not None and slack >= 0
+
+    def fit_square(self, size):
+        """
+        Top left corner of the size by size square that fits into the beam
+        closest to the emitter, found by galloping down the rows until a
+        square fits and binary searching for the first such row. Rounding
+        the edges to whole points makes the fit ragged, so the rows above
+        are checked too, until the slack is far enough below zero that the
+        rounding of the two edges cannot make up for it.
+
+        >>> def pulled(x, y):
+        ...     return 3 * y <= 4 * x <= 5 * y
+        >>> Beam(pulled).fit_square(10)
+        (31, 32)
+        >>> min((y, x) for y in range(200) for x in range(200)
+        ...     if all(pulled(x + dx, y + dy)
+        ...            for dx in (0, 9) for dy in (0, 9)))
+        (32, 31)
+        """
+        low = FIRST_ROW + size - 1
+        high = low
+        while not self.square_fits(high, size):
+            low, high = high, high * 2
+        while low < high:
+            bottom = (low + high) // 2
+            if self.square_fits(bottom, size):
+                high = bottom
+            else:
+                low = bottom + 1
+        bottom = above = low
+        while True:
+            above -= 1
+            slack = self.slack(above, size)
+            if slack is None or slack < -ROUNDING:
+                break
+            if slack >= 0:
+                bottom = above
+        return self.edges(bottom)[0], bottom - size + 1
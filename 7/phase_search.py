@@ -0,0 +1,104 @@
+"""
+Search the phase settings of the amplifiers for the highest signal,
+walking the tree of phase permutations so that the amplifiers of a
+common prefix of phases only run once
+"""
+
+import os
+import sys
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from intcode import (  # noqa: E402
+    BACKEND_INTERPRETER, ExecutionState, run_intcode, run_until)
+
+
+def boot(intcode, backend=BACKEND_INTERPRETER):
+    """ State of an amplifier run up to reading its phase """
+    state = ExecutionState(list(intcode))
+    run_intcode(state, backend)
+    return state
+
+
+def amplify(state, signal, backend=BACKEND_INTERPRETER):
+    """ Next signal an amplifier outputs given a signal, None if it stops """
+    state.inputs.append(signal)
+    run_until(state, 1, backend)
+    return state.outputs.popleft() if state.outputs else None
+
+
+def feedback(states, signal, backend=BACKEND_INTERPRETER):
+    """
+    Pass the signal around the loop of amplifiers until one stops without
+    output, returns the last signal. Amplifiers that stop after their
+    first output, as without a feedback loop, return the signal as is.
+    """
+    while True:
+        for state in states:
+            output = amplify(state, signal, backend)
+            if output is None:
+                return signal
+            signal = output
+
+
+def search_prefix(booted, phases, states, signal, remaining,
+                  backend=BACKEND_INTERPRETER):
+    """
+    Highest (signal, phases) of the permutations starting with phases.
+    states are the amplifiers of those phases after their first output,
+    signal the output of the last one. They are shared by all branches
+    below, so each leaf runs its feedback loop on snapshots of them.
+    """
+    if not remaining:
+        return feedback([state.snapshot() for state in states], signal,
+                        backend), phases
+    best = None
+    for phase in remaining:
+        state = booted.fork([phase])
+        output = amplify(state, signal, backend)
+        if output is None:
+            raise Exception(f'Amplifier with phase {phase} stopped without '
+                            f'output')
+        result = search_prefix(
+            booted, phases + (phase,), states + [state], output,
+            [other for other in remaining if other != phase], backend)
+        best = result if best is None else max(best, result)
+    return best
+
+
+def search_branch(intcode, first, phases, backend=BACKEND_INTERPRETER):
+    """ Highest (signal, phases) of the permutations starting with first """
+    booted = boot(intcode, backend)
+    state = booted.fork([first])
+    output = amplify(state, 0, backend)
+    return search_prefix(booted, (first,), [state], output,
+                         [phase for phase in phases if phase != first],
+                         backend)
+
+
+def search_phases(intcode, phases, backend=BACKEND_INTERPRETER, workers=1):
+    """
+    Highest signal the amplifiers send to the thrusters and the order of
+    phases giving it. Each amplifier runs up to its first output once per
+    prefix of phases, instead of once per permutation, then the feedback
+    loop runs to the end for every permutation.
+
+    The branches of the first phase can be searched in a pool of worker
+    processes, one per core if workers is None, by default the search
+    runs in this process.
+
+    >>> search_phases([3,15,3,16,1002,16,10,16,1,16,15,15,4,15,99,0,0],
+    ...               range(5))
+    (43210, (4, 3, 2, 1, 0))
+    >>> search_phases([3,26,1001,26,-4,26,3,27,1002,27,2,27,1,27,26,
+    ...                27,4,27,1001,28,-1,28,1005,28,6,99,0,0,5],
+    ...               range(5, 10), workers=2)
+    (139629729, (9, 8, 7, 6, 5))
+    """
+    phases = list(phases)
+    branches = [(intcode, first, phases, backend) for first in phases]
+    if workers == 1:
+        return max(search_branch(*branch) for branch in branches)
+    with Pool(workers) as pool:
+        return max(pool.starmap(search_branch, branches))
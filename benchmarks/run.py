@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+"""
+Benchmark the intcode backends on real workloads of the puzzles:
+python benchmarks/run.py [--test] [--repeats N] [--warmup N] [--output FILE]
+                         [--compare FILE] [--backend B] [--workload W]
+The results are written to benchmarks/benchmark-results.json by default.
+"""
+
+import os
+import sys
+import doctest
+import json
+import time
+import platform
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from intcode import (  # noqa: E402
+    STATE_WAIT_FOR_INPUT, BACKEND_INTERPRETER, BACKEND_COMPILED,
+    BACKEND_PROFILED, PROFILE, ExecutionState, load_program, run_intcode)
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+BACKENDS = [BACKEND_INTERPRETER, BACKEND_COMPILED]
+DEFAULT_REPEATS = 5
+DEFAULT_WARMUP = 1
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__),
+                              'benchmark-results.json')
+
+TILE_PADDLE = 3
+TILE_BALL = 4
+# The movement routine and functions solving the scaffold of the checked
+# in 17/input, worked out by hand as in 17/solution_2.py. The scaffold of
+# another input needs its own, as does day 17 itself.
+DAY_17_INPUT = 'A,B,A,C,A,B,A,C,B,C\nR,4,L,12,L,8,R,4\n' \
+    'L,8,R,10,R,10,R,6\nR,4,R,10,L,12\nn\n'
+DAY_19_SIZE = 50
+
+
+def boost(program, backend):
+    """
+    Day 9 part 2, BOOST in sensor boost mode. The self-test of part 1
+    only runs a few hundred instructions, too few to time.
+    """
+    state = ExecutionState(list(program), [2])
+    run_intcode(state, backend)
+    return list(state.outputs)
+
+
+def breakout(program, backend):
+    """ Day 13 part 2, a full game following the ball with the paddle """
+    state = ExecutionState(list(program))
+    state.intcode[0] = 2
+    ball = paddle = score = 0
+    while True:
+        status = run_intcode(state, backend)
+        for x, y, tile in zip(*[iter(state.outputs.drain())] * 3):
+            if x == -1 and y == 0:
+                score = tile
+            elif tile == TILE_BALL:
+                ball = x
+            elif tile == TILE_PADDLE:
+                paddle = x
+        if status != STATE_WAIT_FOR_INPUT:
+            return score
+        state.inputs.append((ball > paddle) - (ball < paddle))
+
+
+def vacuum_robot(program, backend):
+    """ Day 17 part 2, the vacuum robot walking the scaffold """
+    state = ExecutionState(list(program), [ord(char)
+                                           for char in DAY_17_INPUT])
+    state.intcode[0] = 2
+    run_intcode(state, backend)
+    return len(state.outputs)
+
+
+def beam_sweep(program, backend):
+    """ Day 19 part 1, probing every point of the 50x50 area """
+    booted_state = ExecutionState(list(program))
+    run_intcode(booted_state, backend)
+    pulled = 0
+    for y in range(DAY_19_SIZE):
+        for x in range(DAY_19_SIZE):
+            state = booted_state.fork([x, y])
+            run_intcode(state, backend)
+            pulled += state.outputs[0]
+    return pulled
+
+
+# Name, input file and function of each workload
+WORKLOADS = [
+    ('day09-boost', '9/input', boost),
+    ('day13-breakout', '13/input', breakout),
+    ('day17-vacuum', '17/input', vacuum_robot),
+    ('day19-sweep', '19/input', beam_sweep),
+]
+
+
+def count_instructions(workload, program):
+    """ Number of instructions the workload executes """
+    PROFILE.reset()
+    workload(program, BACKEND_PROFILED)
+    count = sum(PROFILE.opcode_counts.values())
+    PROFILE.reset()
+    return count
+
+
+def measure(workload, program, backend, repeats, warmup):
+    """ Wall times of repeats runs, after warmup runs that are not timed """
+    for _ in range(warmup):
+        workload(program, backend)
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        workload(program, backend)
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def summarize(instructions, times):
+    """
+    Result of one workload on one backend
+
+    >>> summarize(3000000, [0.5, 0.25, 0.75])['instructions_per_second']
+    12000000
+    """
+    best = min(times)
+    return {'instructions': instructions, 'times': times, 'best': best,
+            'mean': statistics.mean(times),
+            'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+            'instructions_per_second': round(instructions / best)}
+
+
+def run_benchmarks(workloads, backends, repeats, warmup):
+    """ Results of every workload on every backend, printed as they finish """
+    results = {}
+    print(f'{"workload":16} {"backend":12} {"instructions":>12} '
+          f'{"best s":>8} {"mean s":>8} {"Minstr/s":>9}')
+    for name, filename, workload in workloads:
+        program = load_program(os.path.join(ROOT, filename))
+        instructions = count_instructions(workload, program)
+        expected = workload(program, BACKEND_INTERPRETER)
+        results[name] = {}
+        for backend in backends:
+            if workload(program, backend) != expected:
+                raise Exception(f'{backend} gives a different result '
+                                f'for {name}')
+            result = summarize(instructions, measure(
+                workload, program, backend, repeats, warmup))
+            results[name][backend] = result
+            print(f'{name:16} {backend:12} {instructions:12} '
+                  f'{result["best"]:8.3f} {result["mean"]:8.3f} '
+                  f'{result["instructions_per_second"] / 1e6:9.2f}')
+    return results
+
+
+def compare(results, baseline):
+    """
+    Lines comparing the best times with those of a previous run, a ratio
+    above 1 is a speedup. Workloads that now execute a different number
+    of instructions are not comparable and skipped.
+
+    >>> old = {'day09-boost': {'compiled': {'best': 0.2}}}
+    >>> new = {'day09-boost': {'compiled': {'best': 0.1},
+    ...                        'interpreter': {'best': 0.1}}}
+    >>> print('\\n'.join(compare(new, old)))
+    day09-boost      compiled         2.00x
+    """
+    lines = []
+    for name, backends in results.items():
+        for backend, result in backends.items():
+            previous = baseline.get(name, {}).get(backend)
+            if previous is not None and previous.get('instructions') == \
+                    result.get('instructions'):
+                lines.append(f'{name:16} {backend:12} '
+                             f'{previous["best"] / result["best"]:8.2f}x')
+    return lines
+
+
+def option(argv, name, default):
+    """ Value following an option, or default if it is not given """
+    return argv[argv.index(name) + 1] if name in argv else default
+
+
+def main(argv):
+    """ Main method """
+    if '--test' in argv:
+        doctest.testmod()
+        sys.exit(0)
+    repeats = int(option(argv, '--repeats', DEFAULT_REPEATS))
+    warmup = int(option(argv, '--warmup', DEFAULT_WARMUP))
+    backends = [option(argv, '--backend', None)] if '--backend' in argv \
+        else BACKENDS
+    workloads = [workload for workload in WORKLOADS
+                 if option(argv, '--workload', workload[0]) == workload[0]]
+    results = run_benchmarks(workloads, backends, repeats, warmup)
+    with open(option(argv, '--output', DEFAULT_OUTPUT), 'w') as output:
+        json.dump({'python': platform.python_version(),
+                   'machine': platform.machine(),
+                   'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'repeats': repeats, 'warmup': warmup,
+                   'results': results}, output, indent=2)
+    if '--compare' in argv:
+        with open(option(argv, '--compare', None)) as baseline:
+            print('\n'.join(compare(results, json.load(baseline)['results'])))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
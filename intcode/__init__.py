@@ -0,0 +1,25 @@
+"""
+Shared intcode computer used by the solutions of each day. run_batch
+(intcode.batch) and AsyncMachine (intcode.aio) pull in numpy and
+asyncio, so they are imported from their modules where needed.
+"""
+
+from intcode.engine import (PARAM_MODE_POSITION, PARAM_MODE_IMMEDIATE,
+                            PARAM_MODE_RELATIVE, STATE_NOT_STARTED,
+                            STATE_RUNNING, STATE_WAIT_FOR_INPUT,
+                            STATE_TERMINATED, STATE_OUT_OF_BOUNDS,
+                            STATE_WAIT_FOR_OUTPUT, STATE_BUDGET_EXHAUSTED,
+                            BACKEND_INTERPRETER, BACKEND_COMPILED,
+                            ExecutionState, Logger, OPCODES, run_intcode,
+                            run_until, iter_outputs)
+from intcode.analysis import Analysis
+from intcode.channels import Channel
+from intcode.checkpoint import (Recorder, load_checkpoint, replay,
+                                save_checkpoint)
+from intcode.compiler import run_compiled
+from intcode.loader import load_program
+from intcode.memo import memoize_pure
+from intcode.memory import PagedMemory, DenseMemory, SparseMemory
+from intcode.parallel import parallel_map_runs
+from intcode.profiler import BACKEND_PROFILED, PROFILE, Profile
+from intcode.trace import Tracer, enable_tracing
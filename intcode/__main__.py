@@ -0,0 +1,65 @@
+"""
+Run the doctests of all intcode modules: python -m intcode --test
+Render a trace written by enable_tracing: python -m intcode --trace FILE
+Disassemble a program without running it: python -m intcode --disassemble F
+"""
+
+import sys
+import doctest
+import importlib
+import pkgutil
+
+import intcode
+from intcode.analysis import Analysis
+from intcode.loader import load_program
+from intcode.trace import Tracer, render
+
+USAGE = '''usage: python -m intcode --test
+       python -m intcode --trace trace.bin [--last N]
+       python -m intcode --disassemble input'''
+
+
+def run_tests():
+    """ Run the doctests of every module, exits with 1 if any failed """
+    failed = 0
+    for module_info in pkgutil.iter_modules(intcode.__path__):
+        module = importlib.import_module(f'intcode.{module_info.name}')
+        failed += doctest.testmod(module).failed
+    sys.exit(1 if failed else 0)
+
+
+def print_trace(argv):
+    """ Print the records of the trace file following --trace """
+    records = list(Tracer.load(argv[argv.index('--trace') + 1]).records())
+    if '--last' in argv:
+        records = records[-int(argv[argv.index('--last') + 1]):]
+    for record in records:
+        print(render(record))
+
+
+def print_analysis(argv):
+    """ Print the listing and a summary of the program after --disassemble """
+    analysis = Analysis(load_program(argv[argv.index('--disassemble') + 1]))
+    print(analysis.listing())
+    print(f'{len(analysis.blocks)} blocks, '
+          f'{len(analysis.executed)} of {len(analysis.intcode)} words '
+          f'reachable, {len(analysis.indirect)} computed jumps')
+    print(f'self-modified: {analysis.self_modified}')
+
+
+def main(argv):
+    """ Main method """
+    if '--test' in argv:
+        run_tests()
+    elif '--trace' in argv and argv.index('--trace') + 1 < len(argv):
+        print_trace(argv)
+    elif '--disassemble' in argv and \
+            argv.index('--disassemble') + 1 < len(argv):
+        print_analysis(argv)
+    else:
+        print(USAGE)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,85 @@
+""" Intcode machines scheduled by asyncio """
+
+import asyncio
+
+from intcode.channels import Channel
+from intcode.engine import (STATE_WAIT_FOR_INPUT, STATE_WAIT_FOR_OUTPUT,
+                            BACKEND_INTERPRETER, ExecutionState, run_intcode)
+
+
+class AsyncMachine:
+    """
+    Intcode machine reading its input from an asyncio.Queue and writing
+    its outputs to another, each output is put on the queue before the
+    program reads input or outputs again. Waiting for input awaits the
+    queue, so a network of machines connected by queues is scheduled by
+    the event loop without polling. The idle event is set while the
+    machine waits for input that has not arrived yet.
+
+    An amplifier ring where each machine reads the queue the previous
+    one writes to
+    >>> async def ring(intcode, phases):
+    ...     queues = [asyncio.Queue() for _ in phases]
+    ...     for queue, phase in zip(queues, phases):
+    ...         queue.put_nowait(phase)
+    ...     queues[0].put_nowait(0)
+    ...     machines = [AsyncMachine(intcode, queues[i],
+    ...                              queues[(i+1) % len(queues)])
+    ...                 for i in range(len(queues))]
+    ...     await asyncio.gather(*(machine.run() for machine in machines))
+    ...     return queues[0].get_nowait()
+    >>> asyncio.run(ring([3,26,1001,26,-4,26,3,27,1002,27,2,27,1,27,26,27,4,
+    ...                   27,1001,28,-1,28,1005,28,6,99,0,0,5], [9,8,7,6,5]))
+    139629729
+
+    >>> async def idle():
+    ...     machine = AsyncMachine([3,7,4,7,1105,1,0,0])
+    ...     task = asyncio.create_task(machine.run())
+    ...     await machine.idle.wait()
+    ...     await machine.inputs.put(42)
+    ...     output = await machine.outputs.get()
+    ...     await machine.idle.wait()
+    ...     task.cancel()
+    ...     return output, machine.state.ic
+    >>> asyncio.run(idle())
+    (42, 0)
+    """
+    def __init__(self, intcode, inputs=None, outputs=None,
+                 backend=BACKEND_INTERPRETER):
+        self.state = intcode if isinstance(intcode, ExecutionState) else \
+            ExecutionState(list(intcode))
+        self.state.outputs = Channel(self.state.outputs, capacity=1)
+        self.inputs = asyncio.Queue() if inputs is None else inputs
+        self.outputs = asyncio.Queue() if outputs is None else outputs
+        self.backend = backend
+        self.idle = asyncio.Event()
+
+    def __repr__(self):
+        return f'AsyncMachine({self.state})'
+
+    async def receive(self):
+        """ Move queued input to the state, waiting while there is none """
+        if self.inputs.empty():
+            self.idle.set()
+            value = await self.inputs.get()
+            self.idle.clear()
+            self.state.inputs.append(value)
+        while not self.inputs.empty():
+            self.state.inputs.append(self.inputs.get_nowait())
+
+    async def run(self):
+        """
+        Run until the program terminates or runs past the end of memory,
+        returns the resulting status
+        """
+        while True:
+            status = run_intcode(self.state, self.backend)
+            for value in self.state.outputs.drain():
+                await self.outputs.put(value)
+            if status == STATE_WAIT_FOR_INPUT:
+                await self.receive()
+            elif status == STATE_WAIT_FOR_OUTPUT:
+                # Let other machines run between outputs of a busy one
+                await asyncio.sleep(0)
+            else:
+                return status
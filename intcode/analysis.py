@@ -0,0 +1,265 @@
+""" Static analysis of intcode programs: disassembly, basic blocks and CFG """
+
+from collections import namedtuple
+
+from intcode.engine import (PARAM_MODE_POSITION, PARAM_MODE_IMMEDIATE,
+                            decode)
+
+OPCODE_ADD = 1
+OPCODE_MULTIPLY = 2
+OPCODE_JUMP_IF_TRUE = 5
+OPCODE_JUMP_IF_FALSE = 6
+OPCODE_TERMINATE = 99
+# Opcodes writing to their last parameter
+WRITE_OPCODES = (1, 2, 3, 7, 8)
+JUMP_OPCODES = (OPCODE_JUMP_IF_TRUE, OPCODE_JUMP_IF_FALSE)
+MNEMONICS = {1: 'add', 2: 'mul', 3: 'in', 4: 'out', 5: 'jnz', 6: 'jz',
+             7: 'lt', 8: 'eq', 9: 'arb', 99: 'halt'}
+
+Disassembled = namedtuple('Disassembled', ['address', 'decoded', 'words'])
+# successors are the start addresses of the blocks control can continue
+# at, indirect is set if the block ends in a jump to a computed address
+BasicBlock = namedtuple('BasicBlock', ['start', 'end', 'successors',
+                                       'indirect'])
+
+
+def disassemble_at(intcode, address):
+    """
+    Decode the instruction at address, None if there is no valid one
+
+    >>> instruction = disassemble_at([1002, 4, 3, 4, 33], 0)
+    >>> instruction.address, instruction.decoded.opcode, instruction.words
+    (0, 2, [4, 3, 4])
+    >>> disassemble_at([1002, 4, 3, 4, 33], 4) is None
+    True
+    """
+    if not 0 <= address < len(intcode):
+        return None
+    decoded = decode(intcode[address])
+    if decoded is None or address + decoded.size > len(intcode):
+        return None
+    return Disassembled(address, decoded,
+                        list(intcode[address+1:address+decoded.size]))
+
+
+def jump_targets(instruction):
+    """
+    Addresses control can continue at after the instruction, and whether
+    it can also jump to an address only known at runtime
+
+    >>> from intcode.engine import decode
+    >>> jump_targets(Disassembled(0, decode(1105), [1, 7]))
+    ([7], False)
+    >>> jump_targets(Disassembled(0, decode(1006), [9, 7]))
+    ([3, 7], False)
+    >>> jump_targets(Disassembled(0, decode(2105), [1, 7]))
+    ([], True)
+    """
+    opcode = instruction.decoded.opcode
+    fallthrough = instruction.address + instruction.decoded.size
+    if opcode == OPCODE_TERMINATE:
+        return [], False
+    if opcode not in JUMP_OPCODES:
+        return [fallthrough], False
+    (condition_mode, target_mode) = instruction.decoded.modes
+    condition, target = instruction.words
+    targets = []
+    if condition_mode != PARAM_MODE_IMMEDIATE or \
+            bool(condition) != (opcode == OPCODE_JUMP_IF_TRUE):
+        targets.append(fallthrough)
+    if condition_mode == PARAM_MODE_IMMEDIATE and \
+            bool(condition) != (opcode == OPCODE_JUMP_IF_TRUE):
+        return targets, False
+    if target_mode != PARAM_MODE_IMMEDIATE:
+        return targets, True
+    return targets + [target], False
+
+
+def format_operand(mode, word):
+    """
+    Operand in assembly notation
+
+    >>> format_operand(0, 7), format_operand(1, 7), format_operand(2, -7)
+    ('[7]', '7', '[rb-7]')
+    """
+    if mode == PARAM_MODE_POSITION:
+        return f'[{word}]'
+    if mode == PARAM_MODE_IMMEDIATE:
+        return f'{word}'
+    return f'[rb{word:+}]'
+
+
+class Analysis:
+    """
+    Disassembly of the instructions reachable from the entry points by
+    following control flow, without running the program. Jumps to
+    computed addresses, usually returns from subroutines, cannot be
+    followed. For those, constants an instruction stores (the return
+    addresses pushed before a call) are used as extra entry points.
+
+    written maps every address a position mode parameter writes to the
+    addresses of the instructions writing it. Writes through relative
+    mode parameters cannot be resolved and are listed in relative_writes.
+    Addresses both written and executed are self-modifying code, every
+    other executed address can safely be decoded or compiled once.
+
+    >>> analysis = Analysis([1101,3,4,19,1005,19,11,99,0,0,0,1001,19,-7,19,
+    ...                      1105,1,4,0,0])
+    >>> [(block.start, block.end, block.successors)
+    ...  for block in analysis.blocks]
+    [(0, 4, [4]), (4, 7, [7, 11]), (7, 8, []), (11, 18, [4])]
+    >>> sorted(analysis.written), analysis.self_modified
+    ([19], [])
+    >>> print(analysis.listing())
+    block 0 -> 4
+         0  add         3, 4, [19]
+    block 4 -> 7, 11
+         4  jnz         [19], 11
+    block 7
+         7  halt
+         8  data        0, 0, 0
+    block 11 -> 4
+        11  add         [19], -7, [19]
+        15  jnz         1, 4
+        18  data        0, 0
+    """
+    def __init__(self, intcode, entry_points=(0,)):
+        self.intcode = list(intcode)
+        self.instructions = {}
+        self.indirect = []
+        self.written = {}
+        self.relative_writes = []
+        self.entry_points = set(entry_points)
+        self.explore(list(entry_points))
+        while self.indirect:
+            executed = self.executed
+            constants = [constant for constant in self.stored_constants()
+                         if constant not in executed and
+                         constant not in self.entry_points]
+            if not constants:
+                break
+            self.entry_points.update(constants)
+            self.explore(constants)
+        self.blocks = self.find_blocks()
+
+    def __repr__(self):
+        return f'Analysis({len(self.instructions)} instructions, ' \
+            f'{len(self.blocks)} blocks)'
+
+    def explore(self, pending):
+        """ Disassemble everything reachable from the pending addresses """
+        while pending:
+            address = pending.pop()
+            if address in self.instructions:
+                continue
+            instruction = disassemble_at(self.intcode, address)
+            if instruction is None:
+                continue
+            self.instructions[address] = instruction
+            self.record_write(instruction)
+            targets, indirect = jump_targets(instruction)
+            if indirect:
+                self.indirect.append(address)
+            pending.extend(targets)
+
+    def record_write(self, instruction):
+        """ Note the address the instruction writes to, if any """
+        if instruction.decoded.opcode not in WRITE_OPCODES:
+            return
+        mode = instruction.decoded.modes[-1]
+        if mode == PARAM_MODE_POSITION:
+            self.written.setdefault(instruction.words[-1], []).append(
+                instruction.address)
+        elif mode != PARAM_MODE_IMMEDIATE:
+            self.relative_writes.append(instruction.address)
+
+    def stored_constants(self):
+        """
+        Values of the additions and multiplications of two immediates,
+        which is how programs push return addresses before calling
+        """
+        constants = []
+        for instruction in self.instructions.values():
+            opcode = instruction.decoded.opcode
+            if opcode in (OPCODE_ADD, OPCODE_MULTIPLY) and \
+                    instruction.decoded.modes[:2] == (PARAM_MODE_IMMEDIATE,
+                                                      PARAM_MODE_IMMEDIATE):
+                first, second = instruction.words[:2]
+                constants.append(first + second if opcode == OPCODE_ADD
+                                 else first * second)
+        return [constant for constant in constants
+                if 0 <= constant < len(self.intcode)]
+
+    @property
+    def executed(self):
+        """ Addresses holding the words of reachable instructions """
+        return {instruction.address + i
+                for instruction in self.instructions.values()
+                for i in range(instruction.decoded.size)}
+
+    @property
+    def self_modified(self):
+        """ Sorted addresses that are both written and executed """
+        return sorted(self.executed.intersection(self.written))
+
+    def leaders(self):
+        """ Start addresses of the basic blocks """
+        leaders = set(self.entry_points)
+        for instruction in self.instructions.values():
+            targets, _ = jump_targets(instruction)
+            if instruction.decoded.opcode in JUMP_OPCODES or \
+                    instruction.decoded.opcode == OPCODE_TERMINATE:
+                leaders.update(targets)
+                leaders.add(instruction.address + instruction.decoded.size)
+        return leaders.intersection(self.instructions)
+
+    def find_blocks(self):
+        """ Split the reachable instructions into basic blocks """
+        leaders = self.leaders()
+        blocks = []
+        for start in sorted(leaders):
+            address = start
+            while True:
+                instruction = self.instructions[address]
+                targets, indirect = jump_targets(instruction)
+                address += instruction.decoded.size
+                if targets != [address] or indirect or address in leaders \
+                        or address not in self.instructions:
+                    break
+            blocks.append(BasicBlock(start, address, targets, indirect))
+        return blocks
+
+    def listing(self):
+        """ Disassembly listing of the blocks, with unreached words as data """
+        lines = []
+        address = 0
+        starts = {block.start: block for block in self.blocks}
+        while address < len(self.intcode):
+            if address in starts:
+                block = starts[address]
+                successors = ', '.join(map(str, block.successors))
+                if block.indirect:
+                    successors += ', ?' if successors else '?'
+                lines.append(f'block {address}' +
+                             (f' -> {successors}' if successors else ''))
+            instruction = self.instructions.get(address)
+            if instruction is None:
+                end = address + 1
+                while end < len(self.intcode) and \
+                        end not in self.instructions:
+                    end += 1
+                data = ', '.join(map(str, self.intcode[address:end]))
+                lines.append(f'{address:6}  {"data":11} {data}')
+                address = end
+                continue
+            operands = ', '.join(
+                format_operand(mode, word) for mode, word
+                in zip(instruction.decoded.modes, instruction.words))
+            mnemonic = MNEMONICS[instruction.decoded.opcode]
+            marker = '  ; self-modified' if any(
+                address + i in self.written
+                for i in range(instruction.decoded.size)) else ''
+            lines.append(f'{address:6}  {mnemonic:11} {operands}'.rstrip() +
+                         marker)
+            address += instruction.decoded.size
+        return '\n'.join(lines)
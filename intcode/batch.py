@@ -0,0 +1,281 @@
+""" Run one intcode program on many inputs in lockstep """
+
+from itertools import chain
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from intcode.engine import (PARAM_MODE_POSITION, PARAM_MODE_IMMEDIATE,
+                            BACKEND_INTERPRETER, ExecutionState, decode,
+                            illegal_instruction, run_intcode)
+from intcode.memory import SPARSE_GAP, SparseMemory
+
+OPCODE_ADD = 1
+OPCODE_MULTIPLY = 2
+OPCODE_STORE = 3
+OPCODE_OUTPUT = 4
+OPCODE_JUMP_IF_TRUE = 5
+OPCODE_JUMP_IF_FALSE = 6
+OPCODE_LESS_THAN = 7
+OPCODE_EQUALS = 8
+OPCODE_ADJUST_RELATIVE_BASE = 9
+OPCODE_TERMINATE = 99
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+
+def fits_lanes(start, rows):
+    """
+    Check if the runs can start as lanes: memory is not sparse and every
+    word and input fits in 64 bits
+
+    >>> fits_lanes(ExecutionState([104, 1 << 62, 99]), [[-1 << 63]])
+    True
+    >>> fits_lanes(ExecutionState([104, 1 << 63, 99]), [[]])
+    False
+    """
+    return not isinstance(start.intcode, SparseMemory) and \
+        all(INT64_MIN <= value <= INT64_MAX
+            for value in chain(start.intcode, start.inputs, *rows))
+
+
+class Lanes:
+    """
+    Memory, instruction counters, relative bases and inputs of many runs
+    of the same program as numpy arrays, one row (lane) per run. Lanes
+    at the same instruction counter with the same instruction word are
+    executed together by a single numpy operation per step.
+
+    Lanes that need python ints because a result overflows 64 bits, or
+    that address memory far beyond the rest, are converted to an
+    ExecutionState and finished by the regular backend. Runs that do
+    not fit from the start, see fits_lanes, never become lanes.
+    """
+    def __init__(self, start, rows, backend=BACKEND_INTERPRETER):
+        count = len(rows)
+        self.backend = backend
+        self.memory = numpy.tile(numpy.array(list(start.intcode),
+                                             dtype=numpy.int64), (count, 1))
+        self.ic = numpy.full(count, start.ic, dtype=numpy.int64)
+        self.relative_base = numpy.full(count, start.relative_base,
+                                        dtype=numpy.int64)
+        pending = list(start.inputs)
+        rows = [pending + list(row) for row in rows]
+        self.inputs = numpy.zeros((count, max(map(len, rows), default=0)),
+                                  dtype=numpy.int64)
+        for lane, row in enumerate(rows):
+            self.inputs[lane, :len(row)] = row
+        self.input_count = numpy.array([len(row) for row in rows],
+                                       dtype=numpy.int64)
+        self.input_ix = numpy.zeros(count, dtype=numpy.int64)
+        self.outputs = [list(start.outputs) for _ in range(count)]
+        self.active = numpy.ones(count, dtype=bool)
+
+    def grow(self, address):
+        """ Zero-extend the memory of every lane to hold address """
+        width = self.memory.shape[1]
+        if address >= width:
+            size = max(address + 1, width * 3 // 2)
+            memory = numpy.zeros((len(self.memory), size), dtype=numpy.int64)
+            memory[:, :width] = self.memory
+            self.memory = memory
+
+    def finish_scalar(self, lanes):
+        """ Finish the given lanes with the regular backend """
+        for lane in lanes.tolist():
+            state = ExecutionState(
+                self.memory[lane].tolist(),
+                self.inputs[lane, self.input_ix[lane]:
+                            self.input_count[lane]].tolist(),
+                self.outputs[lane])
+            state.ic = int(self.ic[lane])
+            state.relative_base = int(self.relative_base[lane])
+            run_intcode(state, self.backend)
+            self.outputs[lane] = list(state.outputs)
+        self.active[lanes] = False
+
+    def addresses(self, lanes, ic, modes, first=1):
+        """
+        Address of each parameter for every lane, given the modes of the
+        parameters from the first one on that the instruction reads or
+        writes. Lanes that need a far address are finished by the regular
+        backend and dropped.
+        """
+        self.grow(ic + first + len(modes) - 1)
+        params = []
+        for i, mode in enumerate(modes, first):
+            if mode == PARAM_MODE_POSITION:
+                params.append(self.memory[lanes, ic+i])
+            elif mode == PARAM_MODE_IMMEDIATE:
+                params.append(numpy.full(len(lanes), ic+i, dtype=numpy.int64))
+            else:
+                params.append(self.relative_base[lanes] +
+                              self.memory[lanes, ic+i])
+        if not params or not len(lanes):
+            return lanes, params
+        lowest = min(param.min() for param in params)
+        if lowest < 0:
+            raise Exception(f'Negative address {lowest} at index {ic}')
+        highest = numpy.max(params, axis=0)
+        far = highest - self.memory.shape[1] > max(SPARSE_GAP,
+                                                   self.memory.shape[1])
+        if far.any():
+            self.finish_scalar(lanes[far])
+            lanes = lanes[~far]
+            params = [param[~far] for param in params]
+            highest = highest[~far]
+        if len(lanes):
+            self.grow(int(highest.max()))
+        return lanes, params
+
+    def execute(self, lanes, ic, word):
+        """ Execute the instruction word at ic for the given lanes """
+        decoded = decode(word)
+        if decoded is None:
+            raise illegal_instruction(word, ic)
+        opcode = decoded.opcode
+        next_ic = ic + decoded.size
+        if opcode == OPCODE_TERMINATE:
+            self.active[lanes] = False
+            return
+        if opcode == OPCODE_STORE:
+            # Only lanes that have input left write it
+            waiting = self.input_ix[lanes] >= self.input_count[lanes]
+            self.active[lanes[waiting]] = False
+            lanes = lanes[~waiting]
+        if opcode in (OPCODE_JUMP_IF_TRUE, OPCODE_JUMP_IF_FALSE):
+            # The target is only read by the lanes that jump
+            lanes, params = self.addresses(lanes, ic, decoded.modes[:1])
+            jump = (self.memory[lanes, params[0]] != 0) == \
+                (opcode == OPCODE_JUMP_IF_TRUE)
+            self.ic[lanes[~jump]] = next_ic
+            lanes, params = self.addresses(lanes[jump], ic,
+                                           decoded.modes[1:], first=2)
+            self.ic[lanes] = self.memory[lanes, params[0]]
+            return
+        lanes, params = self.addresses(lanes, ic, decoded.modes)
+        if not len(lanes):
+            return
+        memory = self.memory
+        values = [memory[lanes, param] for param in params[:2]]
+        if opcode in (OPCODE_ADD, OPCODE_MULTIPLY):
+            first, second = values
+            with numpy.errstate(over='ignore'):
+                if opcode == OPCODE_ADD:
+                    result = first + second
+                    overflow = ((first >= 0) == (second >= 0)) & \
+                        ((result >= 0) != (first >= 0))
+                else:
+                    result = first * second
+                    overflow = (first != 0) & \
+                        ((result // numpy.where(first == 0, 1, first) !=
+                          second) | ((first == -1) & (second == result)
+                                     & (second != 0)))
+            if overflow.any():
+                self.finish_scalar(lanes[overflow])
+                lanes, result = lanes[~overflow], result[~overflow]
+                params[2] = params[2][~overflow]
+            memory[lanes, params[2]] = result
+        elif opcode in (OPCODE_LESS_THAN, OPCODE_EQUALS):
+            first, second = values
+            result = first < second if opcode == OPCODE_LESS_THAN else \
+                first == second
+            memory[lanes, params[2]] = result
+        elif opcode == OPCODE_STORE:
+            memory[lanes, params[0]] = \
+                self.inputs[lanes, self.input_ix[lanes]]
+            self.input_ix[lanes] += 1
+        elif opcode == OPCODE_OUTPUT:
+            for lane, value in zip(lanes.tolist(), values[0].tolist()):
+                self.outputs[lane].append(value)
+        elif opcode == OPCODE_ADJUST_RELATIVE_BASE:
+            self.relative_base[lanes] += values[0]
+        self.ic[lanes] = next_ic
+
+    def run(self):
+        """
+        Step every group of lanes sharing an instruction until all lanes
+        have terminated, ran out of input or ran past the end of memory
+        """
+        while True:
+            live = numpy.flatnonzero(self.active)
+            out_of_bounds = self.ic[live] >= self.memory.shape[1]
+            self.active[live[out_of_bounds]] = False
+            live = live[~out_of_bounds]
+            if not len(live):
+                return self.outputs
+            ics = self.ic[live]
+            words = self.memory[live, ics]
+            order = numpy.lexsort((words, ics))
+            live, ics, words = live[order], ics[order], words[order]
+            bounds = numpy.flatnonzero((ics[1:] != ics[:-1]) |
+                                       (words[1:] != words[:-1])) + 1
+            starts = [0, *bounds.tolist()]
+            ends = [*bounds.tolist(), len(live)]
+            for start, end in zip(starts, ends):
+                self.execute(live[start:end], int(ics[start]),
+                             int(words[start]))
+
+
+def run_batch(program, inputs_matrix, backend=BACKEND_INTERPRETER):
+    """
+    Run program once for each row of inputs_matrix and return the outputs
+    of every run, in the order of the rows. A run stops when it
+    terminates, runs out of input or runs past the end of memory. The
+    program is either a list of words or an ExecutionState, which every
+    run continues from, for example after running a prologue once.
+
+    With numpy the runs execute in lockstep, amortizing instruction
+    dispatch over all runs at the same instruction. Without numpy, or if
+    the runs do not fit in lanes, every run uses the given backend in
+    turn.
+
+    >>> run_batch([3,11,3,12,1,11,12,13,4,13,99,0,0,0], [[1, 2], [3, 4], [5]])
+    [[3], [7], []]
+    >>> program = [3,21,1008,21,8,20,1005,20,22,107,8,21,20,1006,20,31,1106,
+    ...            0,36,98,0,0,1002,21,125,20,4,20,1105,1,46,104,999,1105,1,
+    ...            46,1101,1000,1,20,4,20,1105,1,46,98,99]
+    >>> run_batch(program, [[7], [8], [9]])
+    [[999], [1000], [1001]]
+    >>> run_batch([109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,
+    ...            99], [[]]) == [[109,1,204,-1,1001,100,1,100,1008,100,16,
+    ...                            101,1006,101,0,99]]
+    True
+
+    Untaken jumps do not read their target, illegal parameter modes are
+    rejected as by the interpreter
+    >>> run_batch([105,0,-1,104,7,99], [[]])
+    [[7]]
+    >>> run_batch([30001,0,0,0,99], [[]])
+    Traceback (most recent call last):
+        ...
+    Exception: Illegal parameter mode 3 at index 0
+
+    Runs overflowing 64 bits or addressing far memory are finished with
+    python ints, as are programs and inputs with words wider than that
+    >>> run_batch([104,1<<70,3,7,4,7,99,0], [[1], [1<<64]])
+    [[1180591620717411303424, 1], [1180591620717411303424, \
+18446744073709551616]]
+    >>> run_batch([3,11,1002,11,1099511627776,11,4,11,99,0,0,0], [[1], [2]])
+    [[1099511627776], [2199023255552]]
+    >>> run_batch([3,13,1002,13,1099511627776,13,1002,13,1099511627776,13,
+    ...            4,13,99,0], [[1], [2]])
+    [[1208925819614629174706176], [2417851639229258349412352]]
+    >>> run_batch([3,9,1101,7,0,10**12,4,10**12,99,0], [[1]])
+    [[7]]
+    """
+    start = program if isinstance(program, ExecutionState) else \
+        ExecutionState(list(program))
+    rows = [list(row) for row in inputs_matrix]
+    if numpy is None or not fits_lanes(start, rows):
+        outputs = []
+        for row in rows:
+            state = start.snapshot()
+            state.inputs.extend(row)
+            run_intcode(state, backend)
+            outputs.append(list(state.outputs))
+        return outputs
+    return Lanes(start, rows, backend).run()
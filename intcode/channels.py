@@ -0,0 +1,73 @@
+""" FIFO channels carrying values in and out of intcode programs """
+
+from collections import deque
+
+
+class Channel(deque):
+    """
+    FIFO of intcode values. Reading from the front and writing to the
+    back are O(1). A channel with a capacity makes the machine writing to
+    it wait with STATE_WAIT_FOR_OUTPUT while it is full.
+
+    >>> channel = Channel([1, 2, 3])
+    >>> channel.extend([4, 5])
+    >>> channel.popleft(), channel
+    (1, [2, 3, 4, 5])
+    >>> channel.drain(2), channel.drain(), channel == []
+    ([2, 3], [4, 5], True)
+    >>> Channel([1]) == [1], Channel([1]) != [1], Channel([1]) != [2]
+    (True, False, True)
+    >>> Channel(capacity=2).full(), Channel([1, 2], capacity=2).full()
+    (False, True)
+    """
+    def __init__(self, values=(), capacity=None):
+        super().__init__(values)
+        self.capacity = capacity
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, deque)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return Channel, (list(self), self.capacity)
+
+    def full(self):
+        """ Check if the channel has reached its capacity """
+        return self.capacity is not None and len(self) >= self.capacity
+
+    def drain(self, count=None):
+        """ Remove and return up to count values (all by default) """
+        if count is None or count >= len(self):
+            values = list(self)
+            self.clear()
+            return values
+        return [self.popleft() for _ in range(count)]
+
+    def copy(self):
+        """ Copy with the same values and capacity """
+        return Channel(self, self.capacity)
+
+
+def channel(values=None):
+    """
+    Channel for values, which is used as is if it already is a channel so
+    that states can be connected by passing one state's output channel as
+    another's input channel
+
+    >>> outputs = Channel()
+    >>> channel(outputs) is outputs, channel([1, 2]), channel(None)
+    (True, [1, 2], [])
+    """
+    if isinstance(values, Channel):
+        return values
+    return Channel(() if values is None else values)
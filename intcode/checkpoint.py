@@ -0,0 +1,189 @@
+"""
+Checkpoint files and input logs for long interactive intcode sessions,
+so that a session can be resumed from its last checkpoint or replayed
+deterministically up to any input
+"""
+
+import os
+import pickle
+import zlib
+
+from intcode.engine import (BACKEND_INTERPRETER, STATE_WAIT_FOR_INPUT,
+                            ExecutionState, run_intcode)
+from intcode.memory import SparseMemory
+
+CHECKPOINT_MAGIC = b'ICCP'
+CHECKPOINT_VERSION = 1
+DEFAULT_EVERY = 500
+
+
+def save_checkpoint(state, filename, extra=None, inputs_logged=0):
+    """
+    Write the complete state to filename: memory, instruction counter,
+    relative base, status, cycles and budget and pending inputs and
+    outputs, compressed.
+    extra is any picklable data of the driver to restore along with it,
+    inputs_logged the number of inputs in the input log at this point.
+    The file is replaced atomically, a crash while writing keeps the
+    previous checkpoint.
+
+    >>> import tempfile
+    >>> state = ExecutionState([3,9,104,1<<70,3,9,99,0,0,0], [5])
+    >>> run_intcode(state), state.outputs
+    (2, [1180591620717411303424])
+    >>> state.intcode = SparseMemory(state.intcode)
+    >>> state.intcode[10**9] = 7
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     filename = os.path.join(directory, 'state.ckpt')
+    ...     save_checkpoint(state, filename, {'score': 3}, inputs_logged=1)
+    ...     restored, extra, inputs_logged = load_checkpoint(filename)
+    >>> restored.intcode == state.intcode, restored.ic, restored.status
+    (True, 4, 2)
+    >>> restored.outputs, extra, inputs_logged
+    ([1180591620717411303424], {'score': 3}, 1)
+    """
+    memory = state.intcode
+    if isinstance(memory, SparseMemory):
+        memory = (list(memory.dense), memory.table)
+    else:
+        memory = (list(memory), None)
+    data = {'version': CHECKPOINT_VERSION, 'memory': memory,
+            'ic': state.ic, 'relative_base': state.relative_base,
+            'status': state.status, 'inputs': state.inputs,
+            'outputs': state.outputs, 'cycles': state.cycles,
+            'budget': state.budget, 'extra': extra,
+            'inputs_logged': inputs_logged}
+    temporary = f'{filename}.{os.getpid()}'
+    with open(temporary, 'wb') as checkpoint:
+        checkpoint.write(CHECKPOINT_MAGIC)
+        checkpoint.write(zlib.compress(
+            pickle.dumps(data, pickle.HIGHEST_PROTOCOL)))
+    os.replace(temporary, filename)
+
+
+def load_checkpoint(filename):
+    """
+    State, extra data and number of logged inputs of a checkpoint file
+    written by save_checkpoint
+    """
+    with open(filename, 'rb') as checkpoint:
+        if checkpoint.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise Exception(f'{filename} is not an intcode checkpoint')
+        data = pickle.loads(zlib.decompress(checkpoint.read()))
+    if data['version'] != CHECKPOINT_VERSION:
+        raise Exception(f'{filename} has unsupported version '
+                        f'{data["version"]}')
+    dense, table = data['memory']
+    state = ExecutionState(dense if table is None else
+                           SparseMemory(dense, table),
+                           data['inputs'], data['outputs'])
+    state.ic = data['ic']
+    state.relative_base = data['relative_base']
+    state.status = data['status']
+    state.cycles = data['cycles']
+    state.budget = data['budget']
+    return state, data['extra'], data['inputs_logged']
+
+
+def read_input_log(filename):
+    """ Inputs written to an input log by Recorder, oldest first """
+    with open(filename) as log:
+        return [int(line) for line in log if line.strip()]
+
+
+def replay(intcode, inputs, backend=BACKEND_INTERPRETER):
+    """
+    Run a program, or continue a state, feeding it the logged inputs one
+    at a time as it asks for them. Returns the state once the inputs are
+    used up or the program stopped, which is the state the session had
+    when it asked for the next input. Replaying a prefix of the log
+    bisects a session.
+
+    >>> program = [3,20,1001,20,1,21,4,21,3,20,1005,20,0,99]
+    >>> state = replay(program, [4, 1, 7, 0])
+    >>> state.status, state.outputs
+    (3, [5, 8])
+    >>> state = replay(program, [4, 1, 7])
+    >>> state.status, state.outputs, state.ic
+    (2, [5, 8], 8)
+    """
+    state = intcode if isinstance(intcode, ExecutionState) else \
+        ExecutionState(list(intcode))
+    pending = iter(inputs)
+    while run_intcode(state, backend) == STATE_WAIT_FOR_INPUT:
+        value = next(pending, None)
+        if value is None:
+            break
+        state.inputs.append(value)
+    return state
+
+
+class Recorder:
+    """
+    Logs every input a driver sends to a state and writes a checkpoint
+    every so many inputs. The log is flushed with every input, so after
+    a crash the session can be resumed from the checkpoint or replayed
+    from the log.
+
+    >>> import tempfile
+    >>> program = [3,20,1001,20,1,21,4,21,3,20,1005,20,0,99]
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     filename = os.path.join(directory, 'session.ckpt')
+    ...     with Recorder(filename, every=2) as recorder:
+    ...         state = ExecutionState(program)
+    ...         for value in [4, 1, 7]:
+    ...             _ = run_intcode(state)
+    ...             recorder.send(state, value)
+    ...             if recorder.due:
+    ...                 recorder.save(state, extra=len(state.outputs))
+    ...     log = read_input_log(recorder.log_filename)
+    ...     resumed, extra, logged = load_checkpoint(filename)
+    >>> log, resumed.inputs, extra, logged
+    ([4, 1, 7], [1], 1, 2)
+    >>> _ = replay(resumed, log[logged:])
+    >>> resumed.outputs == replay(program, log).outputs
+    True
+    """
+    def __init__(self, filename, every=DEFAULT_EVERY, inputs_logged=0):
+        self.filename = filename
+        self.log_filename = filename + '.log'
+        self.every = every
+        self.inputs_logged = inputs_logged
+        self.saved_at = inputs_logged
+        if inputs_logged:
+            # Resuming, drop the inputs logged after the checkpoint
+            logged = read_input_log(self.log_filename)[:inputs_logged]
+            self.log = open(self.log_filename, 'w')
+            self.log.writelines(f'{value}\n' for value in logged)
+        else:
+            self.log = open(self.log_filename, 'w')
+
+    def __repr__(self):
+        return f'Recorder({self.filename}, {self.inputs_logged} inputs)'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Close the input log """
+        self.log.close()
+
+    @property
+    def due(self):
+        """ Check if every or more inputs were sent since the checkpoint """
+        return self.inputs_logged - self.saved_at >= self.every
+
+    def send(self, state, value):
+        """ Append an input to the state and to the log """
+        state.inputs.append(value)
+        self.log.write(f'{value}\n')
+        self.log.flush()
+        self.inputs_logged += 1
+
+    def save(self, state, extra=None):
+        """ Write a checkpoint of the state """
+        save_checkpoint(state, self.filename, extra, self.inputs_logged)
+        self.saved_at = self.inputs_logged
@@ -0,0 +1,411 @@
+""" Compile straight-line intcode into python functions """
+
+from collections import Counter
+
+from intcode.engine import (PARAM_MODE_POSITION, PARAM_MODE_IMMEDIATE,
+                            STATE_RUNNING, STATE_OUT_OF_BOUNDS,
+                            STATE_BUDGET_EXHAUSTED, BACKEND_COMPILED,
+                            BACKENDS, charge, decode, step)
+
+# Opcodes that only touch memory and the relative base. A block is a run
+# of these, following unconditional jumps, optionally ended by a
+# conditional or computed jump.
+BLOCK_OPCODES = {1: '+', 2: '*', 7: '<', 8: '=='}
+OPCODE_ADJUST_RELATIVE_BASE = 9
+JUMP_OPCODES = {5: '', 6: 'not '}
+MAX_BLOCK_INSTRUCTIONS = 64
+MAX_BLOCKS_PER_ADDRESS = 4
+# Number of changes after which a word of a block is volatile
+VOLATILE_CHANGES = 4
+
+
+class BlockCache:  # pylint: disable=too-few-public-methods
+    """
+    Compiled blocks of one program, kept on the states running it and
+    shared with their forks, so programs run in the same process never
+    see each other's blocks and the blocks go away with the states.
+
+    blocks holds a list per start address of the words each block was
+    compiled from, which are compared against memory before the block
+    runs, and the compiled function (None if no block starts there).
+    changes counts, per start address, how often each word of the blocks
+    starting there changed. Words that keep changing, like operands a
+    program rewrites to index an array, are volatile: instructions with
+    a volatile word are left out of blocks and interpreted, rather than
+    recompiling the block every time they change.
+    """
+    def __init__(self):
+        self.blocks = {}
+        self.changes = {}
+
+    def __repr__(self):
+        return f'BlockCache({len(self.blocks)} addresses)'
+
+
+def operand(mode, word):
+    """
+    Python expression reading a parameter
+
+    >>> operand(0, 7), operand(1, 7), operand(2, -7)
+    ('mem[7]', '7', 'mem[rb + -7]')
+    """
+    if mode == PARAM_MODE_POSITION:
+        return f'mem[{word}]'
+    if mode == PARAM_MODE_IMMEDIATE:
+        return f'{word}'
+    return f'mem[rb + {word}]'
+
+
+def target(mode, word):
+    """
+    Python expression for the address written by a parameter
+
+    >>> target(0, 7), target(2, -7)
+    ('7', 'rb + -7')
+    """
+    if mode == PARAM_MODE_POSITION:
+        return f'{word}'
+    if mode == PARAM_MODE_IMMEDIATE:
+        raise Exception('Cannot write to an immediate mode parameter')
+    return f'rb + {word}'
+
+
+def is_unconditional_jump(decoded, words):
+    """
+    Check if a jump instruction always jumps to an immediate address
+
+    >>> is_unconditional_jump(decode(1105), [1, 7])
+    True
+    >>> is_unconditional_jump(decode(1106), [1, 7])
+    False
+    >>> is_unconditional_jump(decode(105), [1, 7])
+    False
+    """
+    if decoded.modes != (PARAM_MODE_IMMEDIATE, PARAM_MODE_IMMEDIATE):
+        return False
+    return bool(words[0]) == (decoded.opcode == 5)
+
+
+def trace_block(intcode, start, volatile=()):
+    """
+    Collect the instructions of the block starting at start, following
+    unconditional jumps and stopping at an instruction with a word at a
+    volatile address. Returns a list of (address, decoded, words).
+
+    >>> program = [1105, 1, 7, 99, 1, 0, 0, 1101, 1, 1, 0, 1006, 0, 4, 99]
+    >>> [ic for ic, _, _ in trace_block(program, 0)]
+    [0, 7, 11]
+    >>> [ic for ic, _, _ in trace_block(program, 0, volatile={9})]
+    [0]
+    """
+    instructions = []
+    visited = set()
+    ic = start
+    while len(instructions) < MAX_BLOCK_INSTRUCTIONS and \
+            0 <= ic < len(intcode) and ic not in visited:
+        decoded = decode(intcode[ic])
+        if decoded is None or ic + decoded.size > len(intcode) or \
+                any(ic <= address < ic + decoded.size
+                    for address in volatile):
+            break
+        words = intcode[ic+1:ic+decoded.size]
+        if decoded.opcode in BLOCK_OPCODES:
+            if decoded.modes[2] == PARAM_MODE_IMMEDIATE:
+                break
+        elif decoded.opcode not in JUMP_OPCODES and \
+                decoded.opcode != OPCODE_ADJUST_RELATIVE_BASE:
+            break
+        visited.add(ic)
+        instructions.append((ic, decoded, words))
+        if decoded.opcode in JUMP_OPCODES:
+            if not is_unconditional_jump(decoded, words):
+                break
+            ic = words[1]
+        else:
+            ic += decoded.size
+    return instructions
+
+
+def block_segments(instructions):
+    """
+    Merge the addresses of the traced instructions into (start, end) ranges
+
+    >>> block_segments([(0, decode(1105), [1, 7]),
+    ...                 (7, decode(1101), [1, 1, 0])])
+    [(0, 3), (7, 11)]
+    """
+    segments = []
+    for ic, decoded, _ in instructions:
+        if segments and segments[-1][1] == ic:
+            segments[-1] = (segments[-1][0], ic + decoded.size)
+        else:
+            segments.append((ic, ic + decoded.size))
+    return segments
+
+
+def block_source(intcode, start, volatile=()):
+    """
+    Generate the source for the block starting at start. Returns the
+    source and the (start, end) address ranges of the words it was
+    compiled from, or (None, []) if no compilable instruction starts there.
+    Instructions are traced as by trace_block.
+
+    >>> source, segments = block_source([1101, 2, 3, 0, 1105, 1, 9, 0, 99,
+    ...                                  22201, 0, 1, 2, 1006, 0, 4, 99], 0)
+    >>> segments
+    [(0, 7), (9, 16)]
+    >>> print(source)
+    def block(state, mem):
+        rb = state.relative_base
+        ic = 0
+        try:
+            mem[0] = 2 + 3
+            ic = 4
+            ic = 9
+            address = rb + 2
+            mem[address] = mem[rb + 0] + mem[rb + 1]
+            ic = 13
+            if 0 <= address < 7 or 9 <= address < 16:
+                state.ic = 13
+                state.relative_base = rb
+                return True, 3
+            state.ic = 4 if not mem[0] else 16
+        except (IndexError, OverflowError):
+            state.relative_base = rb
+            state.ic = ic
+            return False, {0: 0, 4: 1, 9: 2, 13: 3}[ic]
+        state.relative_base = rb
+        return True, 4
+    """
+    instructions = trace_block(intcode, start, volatile)
+    if not instructions:
+        return None, []
+    segments = block_segments(instructions)
+    overlaps = ' or '.join(f'{a} <= address < {b}' for a, b in segments)
+    lines = []
+    ic = start
+    for index, (ic, decoded, words) in enumerate(instructions):
+        args = list(zip(decoded.modes, words))
+        next_ic = ic + decoded.size
+        if decoded.opcode in BLOCK_OPCODES:
+            expr = f'{operand(*args[0])} {BLOCK_OPCODES[decoded.opcode]} ' \
+                f'{operand(*args[1])}'
+            if decoded.opcode in (7, 8):
+                expr = f'int({expr})'
+            if decoded.modes[2] == PARAM_MODE_POSITION:
+                lines.append(f'mem[{target(*args[2])}] = {expr}')
+                lines.append(f'ic = {next_ic}')
+                if any(later_ic <= words[2] < later_ic + later.size
+                       for later_ic, later, _ in instructions[index+1:]):
+                    # A write into code later in the block ends it
+                    ic = next_ic
+                    break
+            else:
+                lines.append(f'address = {target(*args[2])}')
+                lines.append(f'mem[address] = {expr}')
+                lines.append(f'ic = {next_ic}')
+                lines.append(f'if {overlaps}:')
+                lines.append(f'    state.ic = {next_ic}')
+                lines.append('    state.relative_base = rb')
+                lines.append(f'    return True, {index + 1}')
+        elif decoded.opcode == OPCODE_ADJUST_RELATIVE_BASE:
+            lines.append(f'rb += {operand(*args[0])}')
+            lines.append(f'ic = {next_ic}')
+        elif is_unconditional_jump(decoded, words):
+            lines.append(f'ic = {words[1]}')
+            next_ic = words[1]
+        else:
+            lines.append(f'state.ic = {operand(*args[1])} if '
+                         f'{JUMP_OPCODES[decoded.opcode]}{operand(*args[0])} '
+                         f'else {next_ic}')
+        ic = next_ic
+    if not lines[-1].startswith('state.ic = '):
+        lines.append(f'state.ic = {ic}')
+    executed = ', '.join(f'{address}: {count}' for count, (address, _, _)
+                         in enumerate(instructions[:index+1]))
+    body = '\n'.join(f'        {line}' for line in lines)
+    return (f'def block(state, mem):\n'
+            f'    rb = state.relative_base\n'
+            f'    ic = {start}\n'
+            f'    try:\n'
+            f'{body}\n'
+            f'    except (IndexError, OverflowError):\n'
+            f'        state.relative_base = rb\n'
+            f'        state.ic = ic\n'
+            f'        return False, {{{executed}}}[ic]\n'
+            f'    state.relative_base = rb\n'
+            f'    return True, {index + 1}', segments)
+
+
+def compile_block(intcode, start, volatile=()):
+    """
+    Compile the block starting at start into a function taking the state
+    and its memory. The function updates the relative base and
+    instruction counter and returns False if the instruction at the new
+    instruction counter must be interpreted because it touched
+    unallocated memory or overflowed fixed size memory, True otherwise,
+    along with the number of instructions it executed. Returns the words
+    the block was compiled from as a list of (address, words) and the
+    function, which is None if no block starts at start.
+    """
+    source, segments = block_source(intcode, start, volatile)
+    if source is None:
+        return [(start, intcode[start:start+1])], None
+    namespace = {}
+    code = compile(source, f'<intcode block {start}>', 'exec')
+    exec(code, namespace)  # pylint: disable=exec-used
+    return [(a, intcode[a:b]) for a, b in segments], namespace['block']
+
+
+def changed_words(intcode, segments):
+    """
+    Addresses of the words in memory that differ from the ones a block
+    was compiled from
+
+    >>> changed_words([1101, 5, 6, 7, 99], [(0, [1101, 2, 6, 0])])
+    [1, 3]
+    """
+    return [address + offset for address, words in segments
+            for offset, word in enumerate(words)
+            if address + offset >= len(intcode) or
+            intcode[address + offset] != word]
+
+
+def lookup_block(cache, intcode, start):
+    """
+    Get the compiled block starting at start from a BlockCache, compiling
+    it if the words in memory differ from the ones of every cached block.
+    The words that differ from the last block compiled count as changes,
+    once a word changed often enough it is left out of the blocks
+    starting there.
+
+    >>> cache = BlockCache()
+    >>> program = [1101, 0, 0, 7, 1106, 0, 0, 99]
+    >>> for value in range(VOLATILE_CHANGES + 1):
+    ...     program[1] = value
+    ...     block = lookup_block(cache, program, 0)
+    >>> block, lookup_block(cache, program, 4) is not None
+    (None, True)
+    >>> cache.changes[0]
+    Counter({1: 4})
+    """
+    entries = cache.blocks.get(start)
+    if entries is None:
+        entries = cache.blocks[start] = []
+    for segments, block in entries:
+        for address, words in segments:
+            if intcode[address:address+len(words)] != words:
+                break
+        else:
+            return block
+    changes = cache.changes.get(start)
+    if entries:
+        if changes is None:
+            changes = cache.changes[start] = Counter()
+        for address in changed_words(intcode, entries[0][0]):
+            changes[address] += 1
+            if changes[address] == VOLATILE_CHANGES:
+                # The cached blocks still compile the volatile word in
+                entries.clear()
+    volatile = () if changes is None else \
+        {address for address, count in changes.items()
+         if count >= VOLATILE_CHANGES}
+    segments, block = compile_block(intcode, start, volatile)
+    entries.insert(0, (segments, block))
+    del entries[MAX_BLOCKS_PER_ADDRESS:]
+    return block
+
+
+def run_compiled(state):
+    """
+    Run compiled blocks where possible and interpret input, output and
+    termination, as well as instructions that need to grow memory. Cycles
+    and the step budget are charged per block, with the instructions it
+    executed, so a block may overrun the budget.
+
+    >>> from intcode.engine import ExecutionState, run_intcode
+    >>> state = ExecutionState([1, 0, 0, 0, 99])
+    >>> run_intcode(state, BACKEND_COMPILED)
+    3
+    >>> state.intcode
+    [2, 0, 0, 0, 99]
+    >>> for i in range(7, 10):
+    ...     state = ExecutionState([3,21,1008,21,8,20,1005,20,22,107,8,21,20,
+    ...                             1006,20,31,1106,0,36,98,0,0,1002,21,125,20,
+    ...                             4,20,1105,1,46,104,999,1105,1,46,1101,1000,
+    ...                             1,20,4,20,1105,1,46,98,99], [i])
+    ...     _ = run_intcode(state, BACKEND_COMPILED)
+    ...     state.outputs
+    [999]
+    [1000]
+    [1001]
+    >>> state = ExecutionState([109,1,204,-1,1001,100,1,100,1008,100,16,101,
+    ...                         1006,101,0,99])
+    >>> _ = run_intcode(state, BACKEND_COMPILED)
+    >>> state.outputs
+    [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99]
+    >>> state = ExecutionState([1102,34915192,34915192,7,4,7,99,0])
+    >>> _ = run_intcode(state, BACKEND_COMPILED)
+    >>> state.outputs
+    [1219070632396864]
+
+    Blocks writing into their own code fall back to the new words, blocks
+    leaving early are charged with the instructions they executed
+    >>> state = ExecutionState([1101,100,4,4,99,7,99])
+    >>> _ = run_intcode(state, BACKEND_COMPILED)
+    >>> state.outputs, state.cycles
+    ([7], 3)
+    >>> state = ExecutionState([1101,1,2,3,1101,5,6,200,1101,1,1,1,99])
+    >>> _ = run_intcode(state, BACKEND_COMPILED)
+    >>> state.intcode[200], state.cycles
+    (11, 4)
+    >>> state = ExecutionState([109,4,21101,100,0,0,99,7,99])
+    >>> _ = run_intcode(state, BACKEND_COMPILED)
+    >>> state.intcode[4], state.outputs
+    (100, [])
+    >>> state = ExecutionState([109,6,21101,4,100,0,99,7,99])
+    >>> _ = run_intcode(state, BACKEND_COMPILED)
+    >>> state.outputs
+    [7]
+
+    >>> state = ExecutionState([3,11,3,12,1,11,12,13,4,13,99])
+    >>> run_intcode(state, BACKEND_COMPILED)
+    2
+    >>> state.inputs.extend([20, 22])
+    >>> run_intcode(state, BACKEND_COMPILED), state.outputs
+    (3, [42])
+
+    >>> state = ExecutionState([1101,0,3,12,1001,12,-1,12,1005,12,4,99,0])
+    >>> state.budget = 3
+    >>> run_intcode(state, BACKEND_COMPILED), state.cycles
+    (6, 3)
+    >>> state.budget = None
+    >>> run_intcode(state, BACKEND_COMPILED), state.cycles
+    (3, 8)
+
+    The blocks are kept per program and shared by its forks
+    >>> state.blocks, state.fork().blocks is state.blocks
+    (BlockCache(3 addresses), True)
+    """
+    state.status = STATE_RUNNING
+    cache = state.blocks
+    if cache is None:
+        cache = state.blocks = BlockCache()
+    while state.ic < len(state.intcode):
+        budget = state.budget
+        if budget is not None and budget <= 0:
+            state.status = STATE_BUDGET_EXHAUSTED
+            return state.status
+        block = lookup_block(cache, state.intcode, state.ic)
+        if block is not None:
+            completed, executed = block(state, state.intcode)
+            charge(state, executed)
+            if completed:
+                continue
+        if step(state) != STATE_RUNNING:
+            return state.status
+    state.status = STATE_OUT_OF_BOUNDS
+    return state.status
+
+
+BACKENDS[BACKEND_COMPILED] = run_compiled
@@ -0,0 +1,719 @@
+""" Intcode computer """
+
+from collections import namedtuple
+
+from intcode.channels import channel
+from intcode.memory import grow, promote
+
+PARAM_MODE_POSITION = 0
+PARAM_MODE_IMMEDIATE = 1
+PARAM_MODE_RELATIVE = 2
+PARAM_MODES = (PARAM_MODE_POSITION, PARAM_MODE_IMMEDIATE, PARAM_MODE_RELATIVE)
+
+STATE_NOT_STARTED = 0
+STATE_RUNNING = 1
+STATE_WAIT_FOR_INPUT = 2
+STATE_TERMINATED = 3
+STATE_OUT_OF_BOUNDS = 4
+STATE_WAIT_FOR_OUTPUT = 5
+STATE_BUDGET_EXHAUSTED = 6
+
+BACKEND_INTERPRETER = 'interpreter'
+BACKEND_COMPILED = 'compiled'
+
+# Instructions the interpreter runs between checks of the step budget
+BUDGET_SLICE = 1 << 16
+
+
+def get_param_indices(state, modes, opcode_ix):
+    """
+    Get intcode index for each paremeter, given
+    an array of parameter nodes and the opcode index
+    """
+    return [state.intcode[opcode_ix+i] if mode == PARAM_MODE_POSITION else
+            opcode_ix+i if mode == PARAM_MODE_IMMEDIATE else
+            state.relative_base + state.intcode[opcode_ix+i]
+            for i, mode in enumerate(modes, 1)]
+
+
+def modes_list(modes):
+    """
+    >>> modes_list(300)
+    [0, 0, 3]
+    >>> modes_list(0)
+    [0, 0, 0]
+    >>> modes_list(1234)
+    [4, 3, 2]
+    >>> modes_list(123)
+    [3, 2, 1]
+    """
+    return [modes % 10, modes // 10 % 10, modes // 100 % 10]
+
+
+class ExecutionState:  # pylint: disable=too-few-public-methods
+    """
+    Stores the current state of intcode execution. Inputs and outputs are
+    channels, passing a Channel connects it instead of copying it.
+    cycles counts the executed instructions. budget, if set, is the
+    number of instructions the state may still execute before running it
+    stops with STATE_BUDGET_EXHAUSTED, raising it lets the state continue.
+    blocks holds the blocks the compiled backend compiled for the
+    program, forks share them.
+
+    >>> from intcode.channels import Channel
+    >>> pipe = Channel()
+    >>> producer = ExecutionState([104,7,104,8,99], outputs=pipe)
+    >>> consumer = ExecutionState([3,11,3,12,1,11,12,11,4,11,99], inputs=pipe)
+    >>> _ = run_intcode(producer), run_intcode(consumer)
+    >>> consumer.outputs
+    [15]
+    """
+    def __init__(self, intcode, inputs=None, outputs=None):
+        self.intcode = intcode
+        self.inputs = channel(inputs)
+        self.outputs = channel(outputs)
+        self.ic = 0                         # pylint: disable=invalid-name
+        self.status = STATE_NOT_STARTED
+        self.relative_base = 0
+        self.cycles = 0
+        self.budget = None
+        self.blocks = None
+
+    def __repr__(self):
+        return (f'intcode: {self.intcode}, inputs: {self.inputs}, ' +
+                f'outputs: {self.outputs}, ic: {self.ic}, ' +
+                f'state: {self.status}, relative_base: {self.relative_base}')
+
+    def fork(self, inputs=None):
+        """
+        Copy of this state that continues from the same instruction with
+        the given inputs and no outputs. Memory is copied with its own
+        copy method, a PagedMemory shares its pages until they are written.
+
+        Run the prologue of a program once and fork it at the first input
+
+        >>> state = ExecutionState([1101,5,6,13,3,14,1,13,14,15,4,15,99])
+        >>> run_intcode(state)
+        2
+        >>> forks = [state.fork([i]) for i in range(3)]
+        >>> [(run_intcode(fork), fork.outputs) for fork in forks]
+        [(3, [11]), (3, [12]), (3, [13])]
+        >>> state.status, state.intcode[13]
+        (2, 11)
+        """
+        state = ExecutionState(self.intcode.copy(), list(inputs or ()))
+        state.ic = self.ic
+        state.status = self.status
+        state.relative_base = self.relative_base
+        state.cycles = self.cycles
+        state.budget = self.budget
+        state.blocks = self.blocks
+        return state
+
+    def snapshot(self):
+        """
+        Copy of the complete state, including pending inputs and outputs,
+        that can be kept to fork or resume from later
+
+        >>> state = ExecutionState([3,7,4,7,3,7,99], [42])
+        >>> run_intcode(state)
+        2
+        >>> snapshot = state.snapshot()
+        >>> state.inputs.append(1)
+        >>> _ = run_intcode(state)
+        >>> snapshot.inputs, snapshot.outputs, snapshot.ic, state.ic
+        ([], [42], 4, 6)
+        """
+        state = self.fork()
+        state.inputs = self.inputs.copy()
+        state.outputs = self.outputs.copy()
+        return state
+
+
+class Logger:  # pylint: disable=too-few-public-methods
+    """ Logger class """
+    # Tracer recording every instruction run_intcode executes, see
+    # intcode.trace
+    tracer = None
+
+
+def instruction(num_args, template):
+    """
+    Decorator for defining an intcode function
+    taking num_args parameters. The template is the body of the handlers
+    specialize generates for each combination of parameter modes.
+    """
+    def decorator_instruction(func):
+        func.num_args = num_args
+        func.template = template
+        return func
+    return decorator_instruction
+
+
+@instruction(num_args=3, template='mem[{a2}] = {v0} + {v1}\n'
+                                  'return ic + 4')
+def add(state, lhs_ix, rhs_ix, result_ix):
+    """ Add first and second arguments, store result at third argument """
+    state.intcode[result_ix] = state.intcode[lhs_ix] + state.intcode[rhs_ix]
+
+
+@instruction(num_args=3, template='mem[{a2}] = {v0} * {v1}\n'
+                                  'return ic + 4')
+def multiply(state, lhs_ix, rhs_ix, result_ix):
+    """ Multiply first and second arguments, store result at third argument """
+    state.intcode[result_ix] = state.intcode[lhs_ix] * state.intcode[rhs_ix]
+
+
+@instruction(num_args=1, template='inputs = state.inputs\n'
+                                  'if not inputs:\n'
+                                  '    state.status = STATE_WAIT_FOR_INPUT\n'
+                                  '    return ic\n'
+                                  'mem[{a0}] = inputs[0]\n'
+                                  'inputs.popleft()\n'
+                                  'return ic + 2')
+def store(state, store_ix):
+    """ Store first input in first parameter """
+    if not state.inputs:
+        state.status = STATE_WAIT_FOR_INPUT
+    else:
+        state.intcode[store_ix] = state.inputs[0]
+        state.inputs.popleft()
+
+
+@instruction(num_args=1, template='outputs = state.outputs\n'
+                                  'if outputs.capacity is not None and '
+                                  'outputs.full():\n'
+                                  '    state.status = STATE_WAIT_FOR_OUTPUT\n'
+                                  '    return ic\n'
+                                  'outputs.append({v0})\n'
+                                  'if outputs.capacity is not None and '
+                                  'outputs.full():\n'
+                                  '    state.status = STATE_WAIT_FOR_OUTPUT\n'
+                                  'return ic + 2')
+def output(state, output_ix):
+    """
+    Append value at first argument to outputs, or wait if they are full.
+    Filling the outputs up to their capacity also waits, after the output
+    has been executed, so the values are handed over as soon as they exist.
+    """
+    if state.outputs.capacity is not None and state.outputs.full():
+        state.status = STATE_WAIT_FOR_OUTPUT
+    else:
+        state.outputs.append(state.intcode[output_ix])
+        if state.outputs.full():
+            state.status = STATE_WAIT_FOR_OUTPUT
+
+
+@instruction(num_args=2, template='return {v1} if {v0} else ic + 3')
+def jump_if_true(state, cond_ix, jump_ix):
+    """ Jump to address in second parameter if first parameter is true """
+    if state.intcode[cond_ix]:
+        return state.intcode[jump_ix]
+    return None
+
+
+@instruction(num_args=2, template='return ic + 3 if {v0} else {v1}')
+def jump_if_false(state, cond_ix, jump_ix):
+    """ Jump to address in second parameter if first parameter is false """
+    if not state.intcode[cond_ix]:
+        return state.intcode[jump_ix]
+    return None
+
+
+@instruction(num_args=3, template='mem[{a2}] = int({v0} < {v1})\n'
+                                  'return ic + 4')
+def less_than(state, lhs_ix, rhs_ix, result_ix):
+    """ If first parameter is less than second, store 1 at third
+    parameter, otherwise store 0 """
+    state.intcode[result_ix] = int(
+        state.intcode[lhs_ix] < state.intcode[rhs_ix])
+
+
+@instruction(num_args=3, template='mem[{a2}] = int({v0} == {v1})\n'
+                                  'return ic + 4')
+def equals(state, lhs_ix, rhs_ix, result_ix):
+    """ Check if parameters are equal, store at third parameter """
+    state.intcode[result_ix] = int(
+        state.intcode[lhs_ix] == state.intcode[rhs_ix])
+
+
+@instruction(num_args=1, template='state.relative_base += {v0}\n'
+                                  'return ic + 2')
+def adjust_relative_base(state, relative_base_ix):
+    """ Adjust relative address base with value in first argument """
+    state.relative_base += state.intcode[relative_base_ix]
+
+
+@instruction(num_args=0, template='state.status = STATE_TERMINATED\n'
+                                  'return ic')
+def terminate(state):
+    """ Terminate the program"""
+    state.status = STATE_TERMINATED
+
+
+OPCODES = {
+    1: add,
+    2: multiply,
+    3: store,
+    4: output,
+    5: jump_if_true,
+    6: jump_if_false,
+    7: less_than,
+    8: equals,
+    9: adjust_relative_base,
+    99: terminate
+}
+
+Instruction = namedtuple('Instruction', ['opcode', 'modes', 'handler', 'size'])
+
+# Decoded instructions keyed by the full instruction word. The word holds
+# both the opcode and the parameter modes, so an entry never goes stale:
+# self-modifying code that overwrites an instruction simply produces a
+# different word, and every state running the same program shares entries.
+DECODE_CACHE = {}
+
+
+def decode(word):
+    """
+    Decode an instruction word into opcode, parameter modes, handler and
+    instruction size. Returns None for illegal opcodes and parameter modes.
+
+    >>> decoded = decode(1002)
+    >>> decoded.opcode, decoded.modes, decoded.handler.__name__, decoded.size
+    (2, (0, 1, 0), 'multiply', 4)
+    >>> decode(21107).modes
+    (1, 1, 2)
+    >>> decode(42) is None, decode(301) is None
+    (True, True)
+    """
+    decoded = DECODE_CACHE.get(word)
+    if decoded is None:
+        handler = OPCODES.get(word % 100)
+        if handler is None:
+            return None
+        modes = tuple(modes_list(word // 100)[:handler.num_args])
+        if any(mode not in PARAM_MODES for mode in modes):
+            return None
+        decoded = Instruction(word % 100, modes, handler, handler.num_args + 1)
+        DECODE_CACHE[word] = decoded
+    return decoded
+
+
+def illegal_instruction(word, ic):
+    """
+    Exception for an instruction word at ic that decode rejects
+
+    >>> illegal_instruction(42, 7)
+    Exception('Illegal opcode 42 at index 7')
+    >>> illegal_instruction(30001, 7)
+    Exception('Illegal parameter mode 3 at index 7')
+    """
+    handler = OPCODES.get(word % 100)
+    if handler is None:
+        return Exception(f'Illegal opcode {word % 100} at index {ic}')
+    mode = next(mode for mode in modes_list(word // 100)[:handler.num_args]
+                if mode not in PARAM_MODES)
+    return Exception(f'Illegal parameter mode {mode} at index {ic}')
+
+
+MODE_NAMES = {PARAM_MODE_POSITION: 'pos', PARAM_MODE_IMMEDIATE: 'imm',
+              PARAM_MODE_RELATIVE: 'rel'}
+
+# Specialized handlers keyed by the full instruction word, see specialize
+SPECIALIZED = {}
+
+
+def specialized_source(decoded):
+    """
+    Source of the handler specialized for the opcode and parameter modes
+    of a decoded instruction
+
+    >>> print(specialized_source(decode(21001)))
+    def add_pos_imm_rel(state, mem, ic):
+        mem[state.relative_base + mem[ic + 3]] = mem[mem[ic + 1]] + mem[ic + 2]
+        return ic + 4
+    """
+    addresses = {}
+    values = {}
+    for i, mode in enumerate(decoded.modes):
+        if mode == PARAM_MODE_POSITION:
+            addresses[f'a{i}'] = f'mem[ic + {i + 1}]'
+        elif mode == PARAM_MODE_IMMEDIATE:
+            addresses[f'a{i}'] = f'ic + {i + 1}'
+        else:
+            addresses[f'a{i}'] = f'state.relative_base + mem[ic + {i + 1}]'
+        values[f'v{i}'] = f'mem[{addresses[f"a{i}"]}]' \
+            if mode != PARAM_MODE_IMMEDIATE else f'mem[ic + {i + 1}]'
+    body = decoded.handler.template.format(**addresses, **values)
+    lines = '\n'.join(f'    {line}' for line in body.split('\n'))
+    return f'def {specialized_name(decoded)}(state, mem, ic):\n{lines}'
+
+
+def specialized_name(decoded):
+    """
+    Name of the specialized handler, the handler name followed by modes
+
+    >>> specialized_name(decode(21001))
+    'add_pos_imm_rel'
+    """
+    return '_'.join([decoded.handler.__name__,
+                     *(MODE_NAMES[mode] for mode in decoded.modes)])
+
+
+def specialize(word):
+    """
+    Handler specialized for an instruction word, so that no parameter
+    modes are decoded while running it. It takes the state, its memory
+    and the instruction counter and returns the next instruction counter.
+    Returns None for illegal opcodes.
+
+    >>> specialize(1002).__name__, specialize(99).__name__
+    ('multiply_pos_imm_pos', 'terminate')
+    >>> mem = [1002, 4, 3, 4, 33]
+    >>> specialize(1002)(ExecutionState(mem), mem, 0), mem
+    (4, [1002, 4, 3, 4, 99])
+    """
+    handler = SPECIALIZED.get(word)
+    if handler is None:
+        decoded = decode(word)
+        if decoded is None:
+            return None
+        namespace = {'STATE_WAIT_FOR_INPUT': STATE_WAIT_FOR_INPUT,
+                     'STATE_WAIT_FOR_OUTPUT': STATE_WAIT_FOR_OUTPUT,
+                     'STATE_TERMINATED': STATE_TERMINATED}
+        exec(compile(specialized_source(decoded),  # pylint: disable=exec-used
+                     f'<intcode {word}>', 'exec'), namespace)
+        handler = SPECIALIZED[word] = namespace[specialized_name(decoded)]
+    return handler
+
+
+def grow_memory(state, decoded):
+    """
+    Zero-extend memory so that the instruction at the instruction counter
+    and every address it refers to is valid. Memory grows geometrically,
+    or becomes sparse for far addresses, see intcode.memory.grow.
+    """
+    state.intcode = grow(state.intcode, state.ic + decoded.size - 1)
+    params = get_param_indices(state, decoded.modes, state.ic)
+    if params and min(params) < 0:
+        raise Exception(f'Negative address {min(params)} at index {state.ic}')
+    if params:
+        state.intcode = grow(state.intcode, max(params))
+
+
+def charge(state, executed):
+    """ Count executed instructions and take them off the budget """
+    state.cycles += executed
+    if state.budget is not None:
+        state.budget -= executed
+
+
+def step(state):
+    """
+    Execute the single instruction at the instruction counter,
+    returns the resulting status
+
+    >>> state = ExecutionState([1101, 2, 3, 5, 99])
+    >>> step(state), state.ic, state.intcode
+    (1, 4, [1101, 2, 3, 5, 99, 5, 0])
+    >>> step(state), state.ic, state.cycles
+    (3, 4, 2)
+    """
+    state.status = STATE_RUNNING
+    if state.ic >= len(state.intcode):
+        state.status = STATE_OUT_OF_BOUNDS
+        return state.status
+    if state.budget is not None and state.budget <= 0:
+        state.status = STATE_BUDGET_EXHAUSTED
+        return state.status
+    ic = state.ic
+    word = state.intcode[ic]
+    handler = specialize(word)
+    if handler is None:
+        raise illegal_instruction(word, ic)
+    while True:
+        try:
+            new_ic = handler(state, state.intcode, state.ic)
+            break
+        except IndexError:
+            grow_memory(state, decode(word))
+        except OverflowError:
+            state.intcode = promote(state.intcode)
+    state.ic = new_ic
+    if new_ic != ic or state.status in (STATE_RUNNING, STATE_TERMINATED):
+        charge(state, 1)
+    return state.status
+
+
+def interpret(state):
+    """
+    Run the program one specialized handler at a time until it stops.
+    The instructions are counted by the loop itself, which runs slices of
+    at most BUDGET_SLICE instructions and charges each slice at its end.
+
+    >>> state = ExecutionState([1101,0,3,12,1001,12,-1,12,1005,12,4,99,0])
+    >>> state.budget = 5
+    >>> interpret(state), state.ic, state.cycles
+    (6, 4, 5)
+    >>> state.budget = 100
+    >>> interpret(state), state.cycles, state.budget
+    (3, 8, 97)
+    """
+    state.status = STATE_RUNNING
+    specialized = SPECIALIZED
+    while True:
+        budget = state.budget
+        if budget is not None and budget <= 0:
+            state.status = STATE_BUDGET_EXHAUSTED
+            return state.status
+        todo = BUDGET_SLICE if budget is None else min(budget, BUDGET_SLICE)
+        # Iterations spent growing or promoting memory execute nothing
+        retried = 0
+        for executed in range(todo):
+            intcode = state.intcode
+            ic = state.ic
+            if ic >= len(intcode):
+                charge(state, executed - retried)
+                state.status = STATE_OUT_OF_BOUNDS
+                return state.status
+            word = intcode[ic]
+            handler = specialized.get(word) or specialize(word)
+            if handler is None:
+                charge(state, executed - retried)
+                raise illegal_instruction(word, ic)
+            try:
+                new_ic = handler(state, intcode, ic)
+            except IndexError:
+                # Handlers write memory as their last action, so an
+                # instruction touching unallocated memory can be retried
+                # after growing it
+                grow_memory(state, decode(word))
+                retried += 1
+                continue
+            except OverflowError:
+                # Memory holding fixed size integers is replaced by a list
+                state.intcode = promote(state.intcode)
+                retried += 1
+                continue
+            # Waiting and terminating return the instruction counter
+            # unchanged, waiting executes nothing
+            state.ic = new_ic
+            if state.status != STATE_RUNNING:
+                charge(state, executed - retried + (
+                    new_ic != ic or state.status == STATE_TERMINATED))
+                return state.status
+        charge(state, todo - retried)
+
+
+# Execution backends by name, intcode.compiler registers BACKEND_COMPILED
+BACKENDS = {
+    BACKEND_INTERPRETER: interpret
+}
+
+
+def run_intcode(state, backend=BACKEND_INTERPRETER):
+    """
+    Run until the program terminates, waits for input, waits for room in
+    a bounded output channel or runs past the end of memory. Returns the
+    resulting status.
+
+    Basic tests from previous solutions just to catch regressions
+
+    >>> state = ExecutionState([1, 0, 0, 0, 99])
+    >>> run_intcode(state)
+    3
+    >>> state.intcode
+    [2, 0, 0, 0, 99]
+    >>> state = ExecutionState([2, 3, 0, 3, 99])
+    >>> _ = run_intcode(state)
+    >>> state.intcode
+    [2, 3, 0, 6, 99]
+    >>> state = ExecutionState([2, 4, 4, 5, 99, 0])
+    >>> _ = run_intcode(state)
+    >>> state.intcode
+    [2, 4, 4, 5, 99, 9801]
+    >>> state = ExecutionState([1, 1, 1, 4, 99, 5, 6, 0, 99])
+    >>> _ = run_intcode(state)
+    >>> state.intcode
+    [30, 1, 1, 4, 2, 5, 6, 0, 99]
+    >>> state = ExecutionState([1002, 4, 3, 4, 33])
+    >>> run_intcode(state)
+    3
+    >>> state.intcode
+    [1002, 4, 3, 4, 99]
+
+    This program should output 1 iff input == 8 (position mode)
+    >>> for i in range(7, 10):
+    ...     state = ExecutionState([3,9,8,9,10,9,4,9,99,-1,8], [i])
+    ...     _ = run_intcode(state)
+    ...     state.outputs
+    [0]
+    [1]
+    [0]
+
+    This program should output 1 if input < 8 (position mode)
+    >>> for i in range(7, 10):
+    ...     state = ExecutionState([3,9,7,9,10,9,4,9,99,-1,8], [i])
+    ...     _ = run_intcode(state)
+    ...     state.outputs
+    [1]
+    [0]
+    [0]
+
+    This program should output 1 iff input == 8 (immediate mode)
+    >>> for i in range(7, 10):
+    ...     state = ExecutionState([3,3,1108,-1,8,3,4,3,99], [i])
+    ...     _ = run_intcode(state)
+    ...     state.outputs
+    [0]
+    [1]
+    [0]
+
+    This program should output 1 if input < 8 (immediate mode)
+    >>> for i in range(7, 10):
+    ...     state = ExecutionState([3,3,1107,-1,8,3,4,3,99], [i])
+    ...     _ = run_intcode(state)
+    ...     state.outputs
+    [1]
+    [0]
+    [0]
+
+    Jump test, should output 0 iff input is 0 (position mode)
+    >>> for i in range(3):
+    ...     state = ExecutionState([3,12,6,12,15,1,13,14,13,4,13,99,-1,0,1,9],
+    ...                            [i])
+    ...     _ = run_intcode(state)
+    ...     state.outputs
+    [0]
+    [1]
+    [1]
+
+    This program should output 999 if input < 8, 1000 if == 8, 1001 otherwise
+    >>> for i in range(7, 10):
+    ...     state = ExecutionState([3,21,1008,21,8,20,1005,20,22,107,8,21,20,
+    ...                             1006,20,31,1106,0,36,98,0,0,1002,21,125,20,
+    ...                             4,20,1105,1,46,104,999,1105,1,46,1101,1000,
+    ...                             1,20,4,20,1105,1,46,98,99], [i])
+    ...     _ = run_intcode(state)
+    ...     state.outputs
+    [999]
+    [1000]
+    [1001]
+
+    Takes no input and should produce a copy of itself as output
+    >>> state = ExecutionState([109,1,204,-1,1001,100,1,100,1008,100,16,101,
+    ...                         1006,101,0,99])
+    >>> _ = run_intcode(state)
+    >>> state.outputs
+    [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99]
+
+    Should produce 16 digit number
+    >>> state = ExecutionState([1102,34915192,34915192,7,4,7,99,0])
+    >>> _ = run_intcode(state)
+    >>> len(str(state.outputs[0]))
+    16
+
+    >>> state = ExecutionState([104,1125899906842624,99])
+    >>> _ = run_intcode(state)
+    >>> state.outputs[0]
+    1125899906842624
+
+    Running past the end of memory is reported as a status
+    >>> run_intcode(ExecutionState([1101, 1, 1, 3]))
+    4
+
+    Waiting for input can be resumed once more input is available
+    >>> state = ExecutionState([3,11,3,12,1,11,12,13,4,13,99])
+    >>> run_intcode(state)
+    2
+    >>> state.inputs.append(20)
+    >>> run_intcode(state)
+    2
+    >>> state.inputs.append(22)
+    >>> run_intcode(state)
+    3
+    >>> state.outputs
+    [42]
+
+    A bounded output channel pauses the program until it is drained
+    >>> from intcode.channels import Channel
+    >>> state = ExecutionState([104,1,104,2,104,3,99],
+    ...                        outputs=Channel(capacity=2))
+    >>> run_intcode(state), state.outputs.drain()
+    (5, [1, 2])
+    >>> run_intcode(state), state.outputs.drain()
+    (3, [3])
+
+    Self-modifying code is decoded from the word currently in memory
+    >>> state = ExecutionState([1101,100,4,4,99,7,99])
+    >>> _ = run_intcode(state)
+    >>> state.outputs
+    [7]
+
+    Fixed size memory is promoted to python ints when a value overflows,
+    and far addresses are kept in a sparse table
+    >>> from intcode.memory import DenseMemory
+    >>> state = ExecutionState(DenseMemory([1102,1<<40,1<<40,7,4,7,99,0]))
+    >>> _ = run_intcode(state)
+    >>> state.outputs, type(state.intcode)
+    ([1208925819614629174706176], <class 'list'>)
+    >>> state = ExecutionState([1101,6,7,1000000000000,4,1000000000000,99])
+    >>> _ = run_intcode(state)
+    >>> state.outputs, len(state.intcode.table)
+    ([13], 1)
+    """
+    if Logger.tracer is not None:
+        return Logger.tracer.run(state)
+    return BACKENDS[backend](state)
+
+
+def run_until(state, outputs=1, backend=BACKEND_INTERPRETER):
+    """
+    Run like run_intcode, but also stop as soon as outputs more values
+    have been output. Returns STATE_WAIT_FOR_OUTPUT once they are in
+    state.outputs, running on continues after the last of them.
+
+    >>> state = ExecutionState([104,1,104,2,3,9,104,3,99,0])
+    >>> run_until(state, outputs=2), state.outputs.drain(), state.ic
+    (5, [1, 2], 4)
+    >>> run_until(state, outputs=2)
+    2
+    >>> state.inputs.append(0)
+    >>> run_until(state, outputs=2), state.outputs.drain()
+    (3, [3])
+    """
+    capacity = state.outputs.capacity
+    limit = len(state.outputs) + outputs
+    state.outputs.capacity = limit if capacity is None else \
+        min(capacity, limit)
+    try:
+        return run_intcode(state, backend)
+    finally:
+        state.outputs.capacity = capacity
+
+
+def iter_outputs(state, backend=BACKEND_INTERPRETER):
+    """
+    Generator running the program and yielding each value as soon as it
+    is output. Input appended to state.inputs between values is read when
+    the program asks for it. Stops when the program terminates, runs past
+    the end of memory or waits for input that has not been provided.
+
+    >>> state = ExecutionState([3,11,1002,11,2,12,4,12,1105,1,0,0,0], [1])
+    >>> for value in iter_outputs(state):
+    ...     if value < 8:
+    ...         state.inputs.append(value)
+    ...     print(value)
+    2
+    4
+    8
+    >>> state.status
+    2
+    """
+    while True:
+        status = run_until(state, 1, backend)
+        while state.outputs:
+            yield state.outputs.popleft()
+        if status != STATE_WAIT_FOR_OUTPUT and \
+                (status != STATE_WAIT_FOR_INPUT or not state.inputs):
+            return
@@ -0,0 +1,106 @@
+"""
+Load intcode programs, keeping the parsed words in a binary cache file
+next to the input so that later runs skip parsing
+"""
+
+import hashlib
+import os
+import struct
+from array import array
+
+CACHE_SUFFIX = '.bin'
+CACHE_MAGIC = b'ICPG'
+# Magic, then the SHA-1 of the text the words were parsed from. The
+# words follow as 64 bit integers in the byte order of the machine.
+CACHE_HEADER = struct.Struct('<4s20s')
+
+
+def parse_program(data):
+    """
+    Words of a comma separated program, given as text or bytes
+
+    >>> parse_program(b'1,9,10,3,2,3,11,0,99,30,40,50\\n')
+    [1, 9, 10, 3, 2, 3, 11, 0, 99, 30, 40, 50]
+    """
+    separator = b',' if isinstance(data, bytes) else ','
+    return [int(x) for x in data.split(separator)]
+
+
+def cache_filename(filename):
+    """ Name of the binary cache of a program file """
+    return filename + CACHE_SUFFIX
+
+
+def read_cache(filename, digest):
+    """
+    Words stored in the cache file as an array, None if there is no cache
+    or it was written for different text. The words are read into memory
+    in one piece, which is cheaper than parsing them, but still a copy.
+    """
+    try:
+        with open(filename, 'rb') as cache:
+            data = cache.read()
+        if len(data) < CACHE_HEADER.size or \
+                CACHE_HEADER.unpack_from(data) != (CACHE_MAGIC, digest):
+            return None
+        words = array('q')
+        words.frombytes(data[CACHE_HEADER.size:])
+        return words
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache(filename, digest, words):
+    """ Write the cache file, silently giving up if it cannot be written """
+    temporary = f'{filename}.{os.getpid()}'
+    try:
+        with open(temporary, 'wb') as cache:
+            cache.write(CACHE_HEADER.pack(CACHE_MAGIC, digest))
+            words.tofile(cache)
+        os.replace(temporary, filename)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def load_program(filename='input', memory=list):
+    """
+    Program in filename as memory of the given type, list by default or
+    e.g. DenseMemory or PagedMemory. The words are parsed into 64 bit
+    integers once and cached in filename.bin, keyed by the hash of the
+    text, later runs read the binary words instead of parsing the text.
+    Programs with words that do not fit in 64 bits are parsed every time.
+
+    >>> import tempfile
+    >>> from intcode.memory import DenseMemory
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     filename = os.path.join(directory, 'input')
+    ...     with open(filename, 'w') as program:
+    ...         _ = program.write('1002,4,3,4,33\\n')
+    ...     first = load_program(filename)
+    ...     cached = os.path.exists(cache_filename(filename))
+    ...     second = load_program(filename, DenseMemory)
+    ...     with open(filename, 'w') as program:
+    ...         _ = program.write('104,1125899906842624,99\\n')
+    ...     changed = load_program(filename)
+    >>> first, cached, second, type(second).__name__, changed
+    ([1002, 4, 3, 4, 33], True, [1002, 4, 3, 4, 33], 'DenseMemory', \
+[104, 1125899906842624, 99])
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     filename = os.path.join(directory, 'input')
+    ...     with open(filename, 'w') as program:
+    ...         _ = program.write(f'104,{1 << 70},99')
+    ...     load_program(filename), os.path.exists(cache_filename(filename))
+    ([104, 1180591620717411303424, 99], False)
+    """
+    with open(filename, 'rb') as source:
+        data = source.read()
+    digest = hashlib.sha1(data).digest()
+    words = read_cache(cache_filename(filename), digest)
+    if words is None:
+        try:
+            words = array('q', parse_program(data))
+        except OverflowError:
+            return memory(parse_program(data))
+        write_cache(cache_filename(filename), digest, words)
+    return words.tolist() if memory is list else memory(words)
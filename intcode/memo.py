@@ -0,0 +1,114 @@
+""" Cache the results of programs that are pure functions of their inputs """
+
+from collections import OrderedDict, namedtuple
+
+from intcode.engine import (STATE_TERMINATED, BACKEND_INTERPRETER,
+                            ExecutionState, run_intcode)
+from intcode.parallel import extend_inputs
+
+DEFAULT_MAXSIZE = 1 << 16
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize',
+                                     'currsize'])
+
+
+def outputs_tuple(state):
+    """ Default result of a call, the values output as a tuple """
+    return tuple(state.outputs)
+
+
+class PureProgram:
+    """
+    Program called like a function of its inputs, see memoize_pure
+
+    >>> program = [3,13,3,14,1,13,14,15,4,15,99,0,0,0,0,0]
+    >>> add = memoize_pure(program, maxsize=2)
+    >>> add(1, 2), add(3, 4), add(1, 2), add(5, 6), add(3, 4)
+    ((3,), (7,), (3,), (11,), (7,))
+    >>> add.cache_info()
+    CacheInfo(hits=1, misses=4, maxsize=2, currsize=2)
+
+    Programs asking for more input than a call gives are rejected
+    >>> add(1)
+    Traceback (most recent call last):
+        ...
+    Exception: Program is not a pure function of (1,), it stopped with \
+status 2 and 0 inputs left
+    """
+    def __init__(self, program, maxsize=DEFAULT_MAXSIZE,
+                 prepare=extend_inputs, result=outputs_tuple,
+                 backend=BACKEND_INTERPRETER, budget=None):
+        self.state = program.snapshot() \
+            if isinstance(program, ExecutionState) \
+            else ExecutionState(list(program))
+        self.maxsize = maxsize
+        self.prepare = prepare
+        self.result = result
+        self.backend = backend
+        self.budget = budget
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f'PureProgram({self.cache_info()})'
+
+    def __call__(self, *inputs):
+        cache = self.cache
+        if inputs in cache:
+            cache.move_to_end(inputs)
+            self.hits += 1
+            return cache[inputs]
+        self.misses += 1
+        state = self.state.fork()
+        if self.budget is not None:
+            state.budget = self.budget
+        self.prepare(state, inputs)
+        status = run_intcode(state, self.backend)
+        if status != STATE_TERMINATED or state.inputs:
+            raise Exception(f'Program is not a pure function of {inputs}, '
+                            f'it stopped with status {status} and '
+                            f'{len(state.inputs)} inputs left')
+        value = cache[inputs] = self.result(state)
+        if len(cache) > self.maxsize:
+            cache.popitem(last=False)
+        return value
+
+    def cache_info(self):
+        """ Hits, misses, maximum and current size of the cache """
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                         len(self.cache))
+
+    def cache_clear(self):
+        """ Forget the cached results and the statistics """
+        self.cache.clear()
+        self.hits = self.misses = 0
+
+
+def memoize_pure(program, maxsize=DEFAULT_MAXSIZE, prepare=extend_inputs,
+                 result=outputs_tuple, backend=BACKEND_INTERPRETER,
+                 budget=None):
+    """
+    Wrap a program, a list of words or an ExecutionState to continue
+    from, so that calling it with some inputs runs it and returns
+    result(state), by default the outputs. Results are kept in an LRU
+    cache of maxsize entries keyed by the inputs, so calling it again
+    with the same inputs does not run the program.
+
+    Every call runs on a fork of the program, so no write a run makes to
+    memory persists into the next call. A run must terminate having read
+    all of its inputs, otherwise its results could depend on how inputs
+    are split between calls and an exception is raised. prepare(state,
+    inputs) sets up each run, by default feeding the inputs as input,
+    and budget caps the instructions of each run.
+
+    Day 2 programs are functions of the noun and verb in memory
+    >>> def set_noun_verb(state, inputs):
+    ...     state.intcode[1:3] = inputs
+    >>> program = [1,0,0,3,2,3,11,0,99,30,40,50]
+    >>> run = memoize_pure(program, prepare=set_noun_verb,
+    ...                    result=lambda state: state.intcode[0])
+    >>> run(9, 10), run(10, 9), run(9, 10), run.cache_info().hits
+    (3500, 3500, 3500, 1)
+    """
+    return PureProgram(program, maxsize, prepare, result, backend, budget)
@@ -0,0 +1,249 @@
+""" Memory backends for the intcode computer """
+
+from array import array
+
+PAGE_BITS = 7
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+
+
+class PagedMemory:
+    """
+    Intcode memory split into fixed size pages. Copies share their pages
+    and a page is only copied by the first write to it, so forking a
+    state costs one reference per page instead of a copy of every word.
+
+    >>> memory = PagedMemory(range(300))
+    >>> len(memory), memory[299], memory[10:13]
+    (300, 299, [10, 11, 12])
+    >>> fork = memory.copy()
+    >>> fork.pages[0] is memory.pages[0]
+    True
+    >>> fork[5] = -5
+    >>> fork[5], memory[5]
+    (-5, 5)
+    >>> fork.pages[0] is memory.pages[0], fork.pages[1] is memory.pages[1]
+    (False, True)
+    >>> memory[300]
+    Traceback (most recent call last):
+        ...
+    IndexError: address 300 out of range
+
+    Memory grows like a list when the program addresses beyond its end
+    >>> from intcode.engine import ExecutionState, run_intcode
+    >>> state = ExecutionState(PagedMemory([109,1,204,-1,1001,100,1,100,
+    ...                                     1008,100,16,101,1006,101,0,99]))
+    >>> _ = run_intcode(state)
+    >>> state.outputs
+    [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99]
+    >>> len(state.intcode)
+    151
+    """
+    def __init__(self, intcode=()):
+        words = list(intcode)
+        self.length = len(words)
+        self.pages = [words[i:i+PAGE_SIZE]
+                      for i in range(0, len(words), PAGE_SIZE)]
+        self.owned = [True] * len(self.pages)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, ix):
+        if isinstance(ix, slice):
+            return [self[i] for i in range(*ix.indices(self.length))]
+        if not 0 <= ix < self.length:
+            raise IndexError(f'address {ix} out of range')
+        return self.pages[ix >> PAGE_BITS][ix & PAGE_MASK]
+
+    def __setitem__(self, ix, value):
+        if not 0 <= ix < self.length:
+            raise IndexError(f'address {ix} out of range')
+        page_ix = ix >> PAGE_BITS
+        if not self.owned[page_ix]:
+            self.pages[page_ix] = self.pages[page_ix].copy()
+            self.owned[page_ix] = True
+        self.pages[page_ix][ix & PAGE_MASK] = value
+
+    def __iter__(self):
+        for page in self.pages:
+            yield from page
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def extend(self, values):
+        """ Append values to the end of memory """
+        for value in values:
+            if self.length & PAGE_MASK == 0:
+                self.pages.append([])
+                self.owned.append(True)
+            elif not self.owned[-1]:
+                self.pages[-1] = self.pages[-1].copy()
+                self.owned[-1] = True
+            self.pages[-1].append(value)
+            self.length += 1
+
+    def copy(self):
+        """ Copy sharing all pages, both copies copy a page on write """
+        memory = PagedMemory()
+        memory.length = self.length
+        memory.pages = self.pages.copy()
+        memory.owned = [False] * len(self.pages)
+        self.owned = [False] * len(self.pages)
+        return memory
+
+
+class DenseMemory(array):
+    """
+    Intcode memory stored as 64 bit integers, a quarter of the size of a
+    list of python ints. Storing a value that does not fit raises
+    OverflowError, the engine then promotes the memory to a list.
+
+    >>> memory = DenseMemory([1, 2, 3])
+    >>> memory, memory.copy() == [1, 2, 3], memory[1:].tolist()
+    ([1, 2, 3], True, [2, 3])
+    >>> memory != [1, 2, 3], memory != [1, 2], memory == [1, 2]
+    (False, True, False)
+    >>> memory[0] = 1 << 70  # doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+        ...
+    OverflowError: int too big to convert
+    """
+    def __new__(cls, intcode=()):
+        return super().__new__(cls, 'q', intcode)
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, (list, array)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def copy(self):
+        """ Copy of the memory """
+        return DenseMemory(self)
+
+
+class SparseMemory:
+    """
+    Intcode memory keeping a dense part, normally the program image, and
+    a table of the addresses written or read beyond it. Any non-negative
+    address is valid and reads as 0 until written.
+
+    >>> memory = SparseMemory([1, 2, 3])
+    >>> memory[10**12] = 5
+    >>> memory[10**12], memory[10**9], memory[1], len(memory) == 10**12 + 1
+    (5, 0, 2, True)
+    >>> memory.copy() == memory, memory[:4]
+    (True, [1, 2, 3, 0])
+    >>> memory = SparseMemory([1, 2, 3])
+    >>> list(memory)
+    [1, 2, 3]
+    >>> memory[5] = 7
+    >>> list(memory)
+    [1, 2, 3, 0, 0, 7]
+    """
+    def __init__(self, dense=(), table=None):
+        self.dense = dense if hasattr(dense, 'copy') else list(dense)
+        self.table = {} if table is None else table
+        self.length = max([len(self.dense), *(ix + 1 for ix in self.table)])
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, ix):
+        if isinstance(ix, slice):
+            return [self[i] for i in range(*ix.indices(self.length))]
+        if ix < 0:
+            raise IndexError(f'address {ix} out of range')
+        if ix < len(self.dense):
+            return self.dense[ix]
+        return self.table.get(ix, 0)
+
+    def __iter__(self):
+        yield from self.dense
+        for ix in range(len(self.dense), self.length):
+            yield self.table.get(ix, 0)
+
+    def __setitem__(self, ix, value):
+        if ix < 0:
+            raise IndexError(f'address {ix} out of range')
+        if ix < len(self.dense):
+            self.dense[ix] = value
+        else:
+            self.table[ix] = value
+            if ix >= self.length:
+                self.length = ix + 1
+
+    def __eq__(self, other):
+        if isinstance(other, SparseMemory):
+            return (list(self.dense), self.table, self.length) == \
+                (list(other.dense), other.table, other.length)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'{list(self.dense)} + {dict(sorted(self.table.items()))}'
+
+    def extend(self, values):
+        """ Append values to the end of memory """
+        for value in values:
+            self[self.length] = value
+
+    def copy(self):
+        """ Copy of the memory """
+        return SparseMemory(self.dense.copy(), dict(self.table))
+
+
+# Growing by more than this many words at once switches to SparseMemory
+SPARSE_GAP = 1 << 16
+
+
+def grow(memory, address):
+    """
+    Memory that can hold address. Memory is extended by at least half its
+    size so that a program slowly pushing its stack further grows it in
+    amortized O(1). An address far beyond the end wraps the memory in a
+    SparseMemory instead of allocating everything in between.
+
+    >>> memory = grow([1, 2, 3, 4], 4)
+    >>> memory
+    [1, 2, 3, 4, 0, 0]
+    >>> grow(memory, 10**9)
+    [1, 2, 3, 4, 0, 0] + {}
+    """
+    if address < len(memory):
+        return memory
+    if address - len(memory) > max(SPARSE_GAP, len(memory)):
+        return SparseMemory(memory)
+    size = max(address + 1, len(memory) * 3 // 2)
+    memory.extend([0] * (size - len(memory)))
+    return memory
+
+
+def promote(memory):
+    """
+    Memory that can hold arbitrarily large integers
+
+    >>> promote(DenseMemory([1, 2])), type(promote(DenseMemory([1, 2])))
+    ([1, 2], <class 'list'>)
+    >>> type(promote(SparseMemory(DenseMemory([1]))).dense)
+    <class 'list'>
+    """
+    if isinstance(memory, SparseMemory):
+        return SparseMemory(promote(memory.dense), memory.table)
+    if isinstance(memory, array):
+        return memory.tolist()
+    raise OverflowError(f'{type(memory).__name__} cannot be promoted')
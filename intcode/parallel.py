@@ -0,0 +1,129 @@
+""" Run independent intcode programs in a pool of worker processes """
+
+import os
+from array import array
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+from intcode.engine import BACKEND_INTERPRETER, ExecutionState, run_intcode
+
+# The state every run in a worker process starts from, with the prepare
+# and result functions and the backend, set up once by init_worker
+WORKER = {}
+
+
+def extend_inputs(state, input_set):
+    """ Default preparation of a run, the input set is its input """
+    state.inputs.extend(input_set)
+
+
+def outputs_of(state):
+    """ Default result of a run, the values it output """
+    return list(state.outputs)
+
+
+def share_program(intcode):
+    """
+    Copy the program into a new shared memory block, returns the block or
+    None if a word does not fit in 64 bits
+    """
+    try:
+        words = array('q', intcode)
+    except OverflowError:
+        return None
+    size = len(words) * words.itemsize
+    block = SharedMemory(create=True, size=max(1, size))
+    block.buf[:size] = words.tobytes()
+    return block
+
+
+def init_worker(shared, template, prepare, result, backend):
+    """
+    Set up a worker process. The program is read from the shared memory
+    block named by shared, a (name, length) tuple, unless the template
+    state already holds it.
+    """
+    if shared is not None:
+        name, length = shared
+        block = SharedMemory(name=name)
+        words = array('q')
+        words.frombytes(bytes(block.buf[:length * words.itemsize]))
+        block.close()
+        template.intcode = words.tolist()
+    WORKER.update(template=template, prepare=prepare, result=result,
+                  backend=backend)
+
+
+def run_one(input_set):
+    """ Run the worker's program for one input set """
+    state = WORKER['template'].snapshot()
+    WORKER['prepare'](state, input_set)
+    run_intcode(state, WORKER['backend'])
+    return input_set, WORKER['result'](state)
+
+
+def parallel_map_runs(program, input_sets, workers=None, until=None,
+                      prepare=extend_inputs, result=outputs_of,
+                      backend=BACKEND_INTERPRETER, chunksize=16,
+                      budget=None):
+    """
+    Run program once for every input set in a pool of worker processes
+    (one per core by default) and yield (input_set, result) pairs in the
+    order of the input sets. The program is either a list of words or an
+    ExecutionState every run continues from, and is copied to each worker
+    once through shared memory.
+
+    prepare(state, input_set) sets up each run, by default feeding the
+    input set as input, and result(state) extracts what is yielded, by
+    default the outputs. Both run in the workers, so they must be module
+    level functions. Once a result satisfies until(result) it is yielded
+    and the remaining runs are cancelled, as they are when the caller
+    stops iterating. With a budget every run stops after that many
+    instructions with STATE_BUDGET_EXHAUSTED, which result can check in
+    state.status, so a runaway run cannot hold up the sweep.
+
+    The runs are made in this process, without a pool, when there is a
+    single worker, as on a machine with one core, or when the input sets
+    are a sized collection of no more than one chunk per worker.
+
+    >>> program = [3,9,8,9,10,9,4,9,99,-1,8]
+    >>> list(parallel_map_runs(program, [[7], [8]], workers=2))
+    [([7], [0]), ([8], [1])]
+    >>> runs = list(parallel_map_runs(program, [[i] for i in range(100)],
+    ...                               workers=2, until=lambda out: out[0]))
+    >>> len(runs), runs[-1]
+    (9, ([8], [1]))
+    >>> program = [3,11,1005,11,6,99,1105,1,6,0,0,0]
+    >>> list(parallel_map_runs(program, [[0], [1]], workers=1, budget=100,
+    ...                        result=lambda state: state.status))
+    [([0], 3), ([1], 6)]
+    """
+    template = program.snapshot() if isinstance(program, ExecutionState) \
+        else ExecutionState(list(program))
+    if budget is not None:
+        template.budget = budget
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or (hasattr(input_sets, '__len__') and
+                        len(input_sets) <= workers * chunksize):
+        init_worker(None, template, prepare, result, backend)
+        for pair in map(run_one, input_sets):
+            yield pair
+            if until is not None and until(pair[1]):
+                return
+        return
+    block = share_program(template.intcode)
+    shared = None
+    if block is not None:
+        shared = (block.name, len(template.intcode))
+        template.intcode = []
+    try:
+        with Pool(workers, init_worker,
+                  (shared, template, prepare, result, backend)) as pool:
+            for pair in pool.imap(run_one, input_sets, chunksize):
+                yield pair
+                if until is not None and until(pair[1]):
+                    return
+    finally:
+        if block is not None:
+            block.close()
+            block.unlink()
@@ -0,0 +1,321 @@
+"""
+Fuse common intcode idioms into superinstructions: runs of moves, calls
+and returns through the relative base. This cuts the number of
+dispatches, see DISPATCH_COUNTS, but a superinstruction runs slower than
+the specialized handlers of its instructions, so run_peephole is slower
+than the interpreter. It is kept to study dispatch counts and is not
+registered as a backend, the compiled backend is the fast one.
+"""
+
+from collections import namedtuple, Counter
+
+from intcode.engine import (PARAM_MODE_POSITION, PARAM_MODE_IMMEDIATE,
+                            PARAM_MODE_RELATIVE, STATE_RUNNING,
+                            STATE_TERMINATED, STATE_OUT_OF_BOUNDS,
+                            STATE_BUDGET_EXHAUSTED, BUDGET_SLICE,
+                            SPECIALIZED, charge, decode, grow_memory,
+                            illegal_instruction, specialize)
+from intcode.memory import promote
+
+OPCODE_ADD = 1
+OPCODE_MULTIPLY = 2
+OPCODE_JUMP_IF_TRUE = 5
+OPCODE_JUMP_IF_FALSE = 6
+OPCODE_ADJUST_RELATIVE_BASE = 9
+MAX_MOVES = 16
+
+# kind is one of move, call and ret. moves holds (address, source
+# mode, source, target mode, target) for each move, adjust the relative
+# base adjustment of a return and target the address jumped to, or for
+# a return the relative base offset the return address is read from.
+# instructions is the number of instructions it was built from.
+Superinstruction = namedtuple('Superinstruction', [
+    'kind', 'start', 'end', 'words', 'moves', 'adjust', 'target',
+    'jump_address', 'instructions'])
+
+# Superinstructions keyed by start address, the words of each are
+# compared against memory before it runs. Addresses where no
+# superinstruction starts hold the word found there instead, so a
+# single instruction is validated by comparing one word.
+SUPERINSTRUCTION_CACHE = {}
+
+# Number of superinstructions of each kind and of single instructions
+# dispatched by run_peephole
+DISPATCH_COUNTS = Counter()
+
+
+def as_move(decoded, words):
+    """
+    (source mode, source, target mode, target) if the instruction copies
+    a value, adding 0 or multiplying by 1, otherwise None
+
+    >>> as_move(decode(1101), [0, 7, 9]), as_move(decode(21002), [5, 1, 2])
+    ((1, 7, 0, 9), (0, 5, 2, 2))
+    >>> as_move(decode(1101), [1, 7, 9]) is None
+    True
+    """
+    if decoded.opcode not in (OPCODE_ADD, OPCODE_MULTIPLY) or \
+            decoded.modes[2] == PARAM_MODE_IMMEDIATE:
+        return None
+    neutral = 0 if decoded.opcode == OPCODE_ADD else 1
+    for keep, other in ((0, 1), (1, 0)):
+        if decoded.modes[other] == PARAM_MODE_IMMEDIATE and \
+                words[other] == neutral:
+            return (decoded.modes[keep], words[keep],
+                    decoded.modes[2], words[2])
+    return None
+
+
+def jump_target(decoded, words):
+    """
+    Address an unconditional jump goes to, as (mode, word) where the mode
+    is immediate for a fixed address and relative for a return address
+    read relative to the relative base, otherwise None
+
+    >>> jump_target(decode(1105), [1, 7]), jump_target(decode(2106), [0, -1])
+    ((1, 7), (2, -1))
+    >>> jump_target(decode(1105), [0, 7]) is None
+    True
+    """
+    if decoded.opcode not in (OPCODE_JUMP_IF_TRUE, OPCODE_JUMP_IF_FALSE) or \
+            decoded.modes[0] != PARAM_MODE_IMMEDIATE or \
+            bool(words[0]) != (decoded.opcode == OPCODE_JUMP_IF_TRUE) or \
+            decoded.modes[1] == PARAM_MODE_POSITION:
+        return None
+    return decoded.modes[1], words[1]
+
+
+def instruction_at(intcode, address):
+    """ Decoded instruction and its parameter words, None if not valid """
+    if not 0 <= address < len(intcode):
+        return None
+    decoded = decode(intcode[address])
+    if decoded is None or address + decoded.size > len(intcode):
+        return None
+    return decoded, intcode[address+1:address+decoded.size]
+
+
+def build_superinstruction(intcode, start):
+    """
+    Superinstruction starting at start, None if no idiom starts there.
+    A run of moves ending with an unconditional jump to a fixed address
+    becomes a call, a run of at least two moves without such a jump
+    becomes a move. An adjustment of the relative base followed by a
+    jump to an address read relative to it becomes a ret. A single
+    instruction is not fused.
+
+    >>> build_superinstruction([21101,0,7,0,1105,1,9,99,99,99], 0)[:3]
+    ('call', 0, 7)
+    >>> build_superinstruction([109,-2,2105,1,0], 0)[:3]
+    ('ret', 0, 5)
+    >>> build_superinstruction([1101,0,1,8,1101,0,2,9,99], 0).moves
+    [(0, 1, 1, 0, 8), (4, 1, 2, 0, 9)]
+    >>> build_superinstruction([1105,1,7,1101,0,1,8,99], 0) is None
+    True
+
+    Moves writing into the code that follows end the superinstruction
+    >>> build_superinstruction([1101,0,1,13,1101,0,2,9,1101,0,3,13,99,0],
+    ...                        0).moves
+    [(0, 1, 1, 0, 13), (4, 1, 2, 0, 9)]
+    """
+    moves = []
+    address = start
+    instruction = instruction_at(intcode, address)
+    while instruction is not None and len(moves) < MAX_MOVES:
+        move = as_move(*instruction)
+        if move is None:
+            break
+        moves.append((address, *move))
+        address += instruction[0].size
+        if move[2] == PARAM_MODE_POSITION and \
+                start <= move[3] < address + 4:
+            instruction = None
+            break
+        instruction = instruction_at(intcode, address)
+    count = len(moves)
+    adjust = None
+    if not moves and instruction is not None and \
+            instruction[0].opcode == OPCODE_ADJUST_RELATIVE_BASE and \
+            instruction[0].modes == (PARAM_MODE_IMMEDIATE,):
+        after = instruction_at(intcode, address + 2)
+        if after is not None and \
+                (jump_target(*after) or (None,))[0] == PARAM_MODE_RELATIVE:
+            adjust = instruction[1][0]
+            address += 2
+            count += 1
+            instruction = after
+    target = None if instruction is None else jump_target(*instruction)
+    if target is not None and (
+            (target[0] == PARAM_MODE_IMMEDIATE and moves) or
+            (target[0] == PARAM_MODE_RELATIVE and adjust is not None)):
+        jump_address = address
+        address += instruction[0].size
+        count += 1
+        kind = 'call' if moves else 'ret'
+    elif count > 1:
+        target = jump_address = None
+        kind = 'move'
+    else:
+        return None
+    return Superinstruction(kind, start, address, intcode[start:address],
+                            moves, adjust, target, jump_address, count)
+
+
+def lookup_superinstruction(intcode, start):
+    """
+    Get the superinstruction starting at start, building it if the words
+    in memory differ from the ones it was built from
+    """
+    entry = SUPERINSTRUCTION_CACHE.get(start)
+    if isinstance(entry, Superinstruction) and \
+            intcode[start:entry.end] == entry.words:
+        return entry
+    if entry is not None and entry == intcode[start]:
+        return None
+    superinstruction = build_superinstruction(intcode, start)
+    SUPERINSTRUCTION_CACHE[start] = intcode[start] \
+        if superinstruction is None else superinstruction
+    return superinstruction
+
+
+def execute(state, intcode, superinstruction):
+    """
+    Execute a superinstruction, returns False if the instruction at the
+    new instruction counter must be interpreted because it touched
+    unallocated memory or overflowed fixed size memory, True otherwise,
+    along with the number of instructions it executed
+    """
+    rb = state.relative_base
+    for executed, (address, source_mode, source, target_mode, target) in \
+            enumerate(superinstruction.moves):
+        try:
+            if target_mode == PARAM_MODE_RELATIVE:
+                target += rb
+            intcode[target] = source if source_mode == PARAM_MODE_IMMEDIATE \
+                else intcode[source] if source_mode == PARAM_MODE_POSITION \
+                else intcode[rb + source]
+        except (IndexError, OverflowError):
+            state.ic = address
+            return False, executed
+        if superinstruction.start <= target < superinstruction.end:
+            # Wrote into its own code, continue with the new words
+            state.ic = address + 4
+            return True, executed + 1
+    if superinstruction.target is None:
+        state.ic = superinstruction.end
+        return True, superinstruction.instructions
+    mode, target = superinstruction.target
+    if mode == PARAM_MODE_IMMEDIATE:
+        state.ic = target
+        return True, superinstruction.instructions
+    rb += superinstruction.adjust
+    state.relative_base = rb
+    try:
+        state.ic = intcode[rb + target]
+    except IndexError:
+        state.ic = superinstruction.jump_address
+        return False, superinstruction.instructions - 1
+    return True, superinstruction.instructions
+
+
+def run_peephole(state):
+    """
+    Run superinstructions where possible and interpret everything else,
+    like the interpreter. The cycles and the step budget are charged per
+    slice of the budget as by the interpreter, a superinstruction with
+    the instructions it executed, so it may overrun the budget.
+
+    >>> from intcode.engine import ExecutionState
+    >>> program = [109,200,3,100,21101,0,11,0,1105,1,14,4,100,99,
+    ...            109,1,1001,100,1,100,109,-1,2106,0,0]
+    >>> state = ExecutionState(program, [41])
+    >>> run_peephole(state), state.outputs
+    (3, [42])
+    >>> state = ExecutionState([109,1,204,-1,1001,100,1,100,1008,100,16,101,
+    ...                         1006,101,0,99])
+    >>> _ = run_peephole(state)
+    >>> state.outputs
+    [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99]
+
+    Moves rewriting the code they are fused with
+    >>> state = ExecutionState([1101,0,4,6,1101,0,99,9,99])
+    >>> _ = run_peephole(state)
+    >>> state.intcode[:10]
+    [1101, 0, 4, 6, 1101, 0, 4, 9, 99, 4]
+    >>> state = ExecutionState([1101,0,4,20,1101,0,99,0,104,5,1105,1,0])
+    >>> _ = run_peephole(state)
+    >>> state.outputs, state.cycles
+    ([5], 5)
+    >>> state = ExecutionState([109,6,21101,0,104,0,1105,1,99])
+    >>> _ = run_peephole(state)
+    >>> state.outputs, state.cycles
+    ([1], 4)
+    >>> state = ExecutionState([1101,0,7,3,1101,0,8,200,99])
+    >>> _ = run_peephole(state)
+    >>> state.intcode[200], state.cycles
+    (8, 3)
+
+    >>> state = ExecutionState([1101,0,3,12,1001,12,-1,12,1005,12,4,99,0])
+    >>> state.budget = 3
+    >>> run_peephole(state), state.cycles
+    (6, 3)
+    >>> state.budget = None
+    >>> run_peephole(state), state.cycles
+    (3, 8)
+    """
+    state.status = STATE_RUNNING
+    cache = SUPERINSTRUCTION_CACHE
+    counts = DISPATCH_COUNTS
+    specialized = SPECIALIZED
+    while True:
+        budget = state.budget
+        if budget is not None and budget <= 0:
+            state.status = STATE_BUDGET_EXHAUSTED
+            return state.status
+        todo = BUDGET_SLICE if budget is None else min(budget, BUDGET_SLICE)
+        # Instructions are charged and single dispatches counted once
+        # the slice ends
+        executed = singles = 0
+        while executed < todo:
+            intcode = state.intcode
+            ic = state.ic
+            if ic >= len(intcode):
+                charge(state, executed)
+                counts['single'] += singles
+                state.status = STATE_OUT_OF_BOUNDS
+                return state.status
+            word = intcode[ic]
+            entry = cache.get(ic)
+            if entry != word:
+                superinstruction = lookup_superinstruction(intcode, ic)
+                if superinstruction is not None:
+                    counts[superinstruction.kind] += 1
+                    completed, ran = execute(state, intcode, superinstruction)
+                    executed += ran
+                    if completed:
+                        continue
+                    ic = state.ic
+                    word = intcode[ic]
+            singles += 1
+            handler = specialized.get(word) or specialize(word)
+            if handler is None:
+                charge(state, executed)
+                counts['single'] += singles
+                raise illegal_instruction(word, ic)
+            try:
+                new_ic = handler(state, intcode, ic)
+            except IndexError:
+                grow_memory(state, decode(word))
+                continue
+            except OverflowError:
+                state.intcode = promote(state.intcode)
+                continue
+            state.ic = new_ic
+            if state.status != STATE_RUNNING:
+                charge(state, executed + (
+                    new_ic != ic or state.status == STATE_TERMINATED))
+                counts['single'] += singles
+                return state.status
+            executed += 1
+        charge(state, executed)
+        counts['single'] += singles
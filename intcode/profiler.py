@@ -0,0 +1,152 @@
+""" Count and time the instructions an intcode program executes """
+
+import json
+from collections import Counter
+from time import perf_counter_ns
+
+from intcode.engine import (STATE_RUNNING, STATE_TERMINATED,
+                            STATE_OUT_OF_BOUNDS, BACKENDS, OPCODES, decode,
+                            step)
+
+BACKEND_PROFILED = 'profiled'
+
+
+class Profile:
+    """
+    Executions per address and per opcode, time and runs per basic block
+    (keyed by the address it starts at, a block ends at a taken jump or
+    when the program stops) and memory growth events as (address of the
+    instruction, old size, new size)
+    """
+    def __init__(self):
+        self.address_counts = Counter()
+        self.address_words = {}
+        self.opcode_counts = Counter()
+        self.block_times = Counter()
+        self.block_runs = Counter()
+        self.growth = []
+
+    def __repr__(self):
+        return f'Profile({sum(self.opcode_counts.values())} instructions)'
+
+    def reset(self):
+        """ Forget everything recorded so far """
+        self.__init__()
+
+    def as_dict(self):
+        """ The profile as JSON serializable data, hottest entries first """
+        return {
+            'instructions': sum(self.opcode_counts.values()),
+            'opcodes': {OPCODES[opcode].__name__: count for opcode, count
+                        in self.opcode_counts.most_common()},
+            'addresses': {str(address): count for address, count
+                          in self.address_counts.most_common()},
+            'blocks': {str(start): {'runs': self.block_runs[start],
+                                    'ns': time}
+                       for start, time in self.block_times.most_common()},
+            'growth': [list(event) for event in self.growth],
+        }
+
+    def dump(self, filename):
+        """ Write the profile to a JSON file """
+        with open(filename, 'w') as output:
+            json.dump(self.as_dict(), output, indent=2)
+
+    def report(self, top=10):
+        """
+        Text report of the opcodes, the top hottest addresses and the top
+        blocks taking the most time, and all memory growth events
+
+        >>> from intcode.engine import ExecutionState
+        >>> profile = Profile()
+        >>> state = ExecutionState([1101,0,3,13,1001,13,-1,13,1005,13,4,99,0])
+        >>> run_profiled(state, profile)
+        3
+        >>> print(profile.report(top=2))  # doctest: +ELLIPSIS
+        8 instructions
+        opcode                    count  share
+        add                           4  50.0%
+        jump_if_true                  3  37.5%
+        terminate                     1  12.5%
+        address  opcode            count  share
+              4  add                   3  37.5%
+              8  jump_if_true          3  37.5%
+          block       runs       total ns    mean ns
+              0          1 ...
+              4          2 ...
+        memory growth
+              0  add               13 -> 19
+        """
+        total = sum(self.opcode_counts.values()) or 1
+        lines = [f'{sum(self.opcode_counts.values())} instructions',
+                 f'{"opcode":20} {"count":>10}  share']
+        for opcode, count in self.opcode_counts.most_common():
+            lines.append(f'{OPCODES[opcode].__name__:20} {count:10} '
+                         f'{100 * count / total:5.1f}%')
+        lines.append(f'{"address":>7}  {"opcode":12} {"count":>10}  share')
+        for address, count in self.address_counts.most_common(top):
+            lines.append(f'{address:7}  {self.opcode_name(address):12} '
+                         f'{count:10} {100 * count / total:5.1f}%')
+        lines.append(f'{"block":>7} {"runs":>10} {"total ns":>14} '
+                     f'{"mean ns":>10}')
+        for start, time in self.block_times.most_common(top):
+            runs = self.block_runs[start]
+            lines.append(f'{start:7} {runs:10} {time:14} {time // runs:10}')
+        if self.growth:
+            lines.append('memory growth')
+        for address, old, new in self.growth:
+            lines.append(f'{address:7}  {self.opcode_name(address):12} '
+                         f'{old:7} -> {new}')
+        return '\n'.join(lines)
+
+    def opcode_name(self, address):
+        """ Name of the opcode last executed at address """
+        return OPCODES[self.address_words[address] % 100].__name__
+
+
+# Profile recorded by the profiled backend
+PROFILE = Profile()
+
+
+def run_profiled(state, profile=None):
+    """
+    Run like the interpreter while recording every executed instruction
+    in profile, PROFILE by default
+    """
+    profile = PROFILE if profile is None else profile
+    state.status = STATE_RUNNING
+    block_start, started = state.ic, perf_counter_ns()
+    block_size = 0
+    while state.ic < len(state.intcode):
+        ic = state.ic
+        word = state.intcode[ic]
+        size = len(state.intcode)
+        status = step(state)
+        # Waiting before an instruction or running out of budget
+        # executes nothing, an output filling the outputs waits after
+        # it executed
+        if state.ic == ic and \
+                status not in (STATE_RUNNING, STATE_TERMINATED):
+            break
+        profile.address_counts[ic] += 1
+        profile.address_words[ic] = word
+        profile.opcode_counts[word % 100] += 1
+        if len(state.intcode) != size:
+            profile.growth.append((ic, size, len(state.intcode)))
+        block_size += 1
+        if status != STATE_RUNNING or state.ic != ic + decode(word).size:
+            now = perf_counter_ns()
+            profile.block_times[block_start] += now - started
+            profile.block_runs[block_start] += 1
+            block_start, started, block_size = state.ic, now, 0
+        if status != STATE_RUNNING:
+            return status
+    else:
+        state.status = STATE_OUT_OF_BOUNDS
+    if block_size:
+        profile.block_times[block_start] += perf_counter_ns() - started
+        profile.block_runs[block_start] += 1
+    return state.status
+
+
+BACKENDS[BACKEND_PROFILED] = run_profiled
@@ -0,0 +1,172 @@
+"""
+Record executed intcode instructions into a ring buffer of binary records
+and render them afterwards: python -m intcode --trace trace.bin [--last N]
+"""
+
+import atexit
+import struct
+from array import array
+
+from intcode.engine import (STATE_RUNNING, STATE_TERMINATED,
+                            STATE_OUT_OF_BOUNDS, Logger, decode,
+                            get_param_indices, grow_memory, step)
+
+# A record is the address, the instruction word, up to three parameter
+# addresses and the result: the value written or output, the instruction
+# counter after a jump or the relative base after adjusting it
+RECORD_WORDS = 6
+DEFAULT_CAPACITY = 1 << 16
+TRACE_MAGIC = b'ICTR'
+TRACE_HEADER = struct.Struct('<4sqq')
+# Stored in place of values that do not fit in a record
+TRACE_OVERFLOW = -(1 << 63)
+
+OPCODE_JUMP_IF_TRUE = 5
+OPCODE_JUMP_IF_FALSE = 6
+OPCODE_ADJUST_RELATIVE_BASE = 9
+OPCODE_TERMINATE = 99
+
+
+class Tracer:
+    """
+    Ring buffer holding the last capacity executed instructions. While a
+    tracer is set as Logger.tracer every run_intcode call runs through
+    Tracer.run, otherwise the backends run without any tracing cost.
+
+    >>> from intcode.engine import ExecutionState, run_intcode
+    >>> tracer = Tracer(capacity=3)
+    >>> Logger.tracer = tracer
+    >>> state = ExecutionState([3,11,1002,11,-2,12,4,12,1105,1,13,0,0,99])
+    >>> state.inputs.append(21)
+    >>> run_intcode(state), state.outputs
+    (3, [-42])
+    >>> Logger.tracer = None
+    >>> tracer.count
+    5
+    >>> for record in tracer.records():
+    ...     print(render(record))
+         6  output                   [12] -> -42
+         8  jump_if_true(1, 1)       [9, 10] -> 13
+        13  terminate                [] -> 0
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.buffer = array('q', [0]) * (capacity * RECORD_WORDS)
+        self.count = 0
+
+    def __repr__(self):
+        return f'Tracer({self.count} records, capacity {self.capacity})'
+
+    def record(self, address, word, params, result):
+        """ Store a record, overwriting the oldest once the buffer is full """
+        values = [address, word, *params, *[0] * (3 - len(params)), result]
+        start = (self.count % self.capacity) * RECORD_WORDS
+        try:
+            self.buffer[start:start+RECORD_WORDS] = array('q', values)
+        except OverflowError:
+            self.buffer[start:start+RECORD_WORDS] = array('q', [
+                value if -(1 << 63) < value < 1 << 63 else TRACE_OVERFLOW
+                for value in values])
+        self.count += 1
+
+    def records(self):
+        """ The buffered records as tuples, oldest first """
+        first = max(0, self.count - self.capacity)
+        for index in range(first, self.count):
+            start = (index % self.capacity) * RECORD_WORDS
+            yield tuple(self.buffer[start:start+RECORD_WORDS])
+
+    def run(self, state):
+        """ Interpret the program one step at a time, recording each step """
+        state.status = STATE_RUNNING
+        while state.ic < len(state.intcode):
+            address = state.ic
+            word = state.intcode[address]
+            decoded = decode(word)
+            if decoded is not None:
+                try:
+                    params = get_param_indices(state, decoded.modes, address)
+                except IndexError:
+                    grow_memory(state, decoded)
+                    params = get_param_indices(state, decoded.modes, address)
+            status = step(state)
+            # Waiting before an instruction or running out of budget
+            # executes nothing, an output filling the outputs waits after
+            # it executed
+            if state.ic == address and \
+                    status not in (STATE_RUNNING, STATE_TERMINATED):
+                return status
+            if decoded.opcode in (OPCODE_JUMP_IF_TRUE, OPCODE_JUMP_IF_FALSE):
+                result = state.ic
+            elif decoded.opcode == OPCODE_ADJUST_RELATIVE_BASE:
+                result = state.relative_base
+            elif decoded.opcode == OPCODE_TERMINATE:
+                result = 0
+            else:
+                result = state.intcode[params[-1]]
+            self.record(address, word, params, result)
+            if status != STATE_RUNNING:
+                return status
+        state.status = STATE_OUT_OF_BOUNDS
+        return state.status
+
+    def dump(self, filename):
+        """ Write the buffer to a binary trace file """
+        with open(filename, 'wb') as output:
+            output.write(TRACE_HEADER.pack(TRACE_MAGIC, self.capacity,
+                                           self.count))
+            self.buffer.tofile(output)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Read a trace file written by dump
+
+        >>> import os, tempfile
+        >>> tracer = Tracer(capacity=2)
+        >>> for address in range(3):
+        ...     tracer.record(address, 1101, [address + 1, address + 2, 9],
+        ...                   1 << 70)
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     filename = os.path.join(directory, 'trace.bin')
+        ...     tracer.dump(filename)
+        ...     for record in Tracer.load(filename).records():
+        ...         print(render(record))
+             1  add(1, 1, 0)             [2, 3, 9] -> ?
+             2  add(1, 1, 0)             [3, 4, 9] -> ?
+        """
+        with open(filename, 'rb') as trace:
+            magic, capacity, count = TRACE_HEADER.unpack(
+                trace.read(TRACE_HEADER.size))
+            if magic != TRACE_MAGIC:
+                raise Exception(f'{filename} is not an intcode trace')
+            tracer = cls(capacity)
+            tracer.buffer = array('q')
+            tracer.buffer.fromfile(trace, capacity * RECORD_WORDS)
+            tracer.count = count
+        return tracer
+
+
+def render(record):
+    """ Text line describing a record """
+    address, word, *params, result = record
+    decoded = decode(word)
+    if decoded is None:
+        return f'{address:6}  illegal word {word}'
+    name = decoded.handler.__name__
+    if any(decoded.modes):
+        name += f'{decoded.modes}'.replace(',)', ')')
+    params = params[:len(decoded.modes)]
+    result = '?' if result == TRACE_OVERFLOW else result
+    return f'{address:6}  {name:24} {params} -> {result}'
+
+
+def enable_tracing(filename='trace.bin', capacity=DEFAULT_CAPACITY):
+    """
+    Trace every following run_intcode call and write the trace to
+    filename when the program exits
+    """
+    tracer = Tracer(capacity)
+    Logger.tracer = tracer
+    atexit.register(tracer.dump, filename)
+    return tracer